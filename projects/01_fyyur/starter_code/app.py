@@ -3,15 +3,26 @@
 #----------------------------------------------------------------------------#
 
 import json
+import base64
+import binascii
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+import functools
+from datetime import datetime, timedelta
+from itertools import groupby
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, session
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 import logging
-from logging import Formatter, FileHandler
+from log_pipeline import init_logging
 from flask_wtf import Form
 from forms import *
+import search
+from autocomplete import PrefixIndex, AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT
+from page_cache import create_page_cache
+from schedule import ScheduleCache
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -20,22 +31,50 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 db = SQLAlchemy(app)
-
-# TODO: connect to a local postgresql database
+migrate = Migrate(app, db)
+page_cache = create_page_cache(app.config)
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    # genre browsing goes from the genre to its artists
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        # the /venues directory is ordered and grouped by area
+        db.Index('ix_venue_state_city', 'state', 'city'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    # NOT NULL: the /venues cursor compares (state, city, id), and a NULL
+    # would drop the venue from every page after the first
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=venue_genres, order_by=Genre.name)
+    # comma separated copy of the genre names, indexed for full-text search
+    genre_names = db.Column('genres', db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
@@ -43,34 +82,257 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_artist_state', 'state'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by=Genre.name)
+    # comma separated copy of the genre names, indexed for full-text search
+    genre_names = db.Column('genres', db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    # PostgreSQL rejects overlapping [start_time, end_time) bookings of an
+    # artist or a venue with exclusion constraints (see the migrations)
+    end_time = db.Column(db.DateTime, nullable=False)
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+name_index = PrefixIndex()
+
+def name_rows():
+  venues = db.session.query(db.literal('venue'), Venue.id, Venue.name)
+  artists = db.session.query(db.literal('artist'), Artist.id, Artist.name)
+  return venues.union_all(artists).yield_per(10000)
+
+#----------------------------------------------------------------------------#
+# Schedules.
+#----------------------------------------------------------------------------#
+
+SHOW_DEFAULT_MINUTES = 120
+SHOW_MAX_MINUTES = 24 * 60
+# longest window an availability request may ask for
+AVAILABILITY_MAX_DAYS = 90
+
+def load_bookings(kind, id):
+  fk = Show.venue_id if kind == 'venue' else Show.artist_id
+  return db.session.query(Show.start_time, Show.end_time).filter(fk == id).all()
+
+schedules = ScheduleCache(load_bookings)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@functools.lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  # babel resolves the locale and parses the pattern again on every call
+  pattern = DATETIME_FORMATS.get(format, format)
+  if pattern in ('long', 'short'):
+    return None, locale
+  return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+@functools.lru_cache(maxsize=4096)
+def _format_datetime(value, zone, format, locale):
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  pattern, locale = datetime_pattern(format, locale)
+  if pattern is None:
+    return babel.dates.format_datetime(value, format, locale=locale)
+  if value.tzinfo is None:
+    # same as babel.dates.format_datetime
+    value = value.replace(tzinfo=babel.dates.UTC)
+  return pattern.apply(value, locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # accepts datetimes from the models as well as ISO strings. Aware
+  # datetimes equal as instants print differently in each zone, so the
+  # zone is part of the cache key.
+  zone = (value.tzinfo, value.utcoffset()) if isinstance(value, datetime) else None
+  return _format_datetime(value, zone, format, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Form helpers.
+#----------------------------------------------------------------------------#
+
+def fill_venue(venue, form):
+  for field in ('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link'):
+    setattr(venue, field, form.get(field))
+  set_genres(venue, form.getlist('genres'))
+
+def fill_artist(artist, form):
+  for field in ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link'):
+    setattr(artist, field, form.get(field))
+  set_genres(artist, form.getlist('genres'))
+
+def set_genres(record, names):
+  names = sorted(set(name.strip() for name in names if name.strip()))
+  genres = Genre.query.filter(Genre.name.in_(names)).all() if names else []
+  known = {genre.name for genre in genres}
+  genres += [Genre(name=name) for name in names if name not in known]
+  record.genres = genres
+  record.genre_names = ','.join(names)
+
+#----------------------------------------------------------------------------#
+# Show listings.
+#----------------------------------------------------------------------------#
+
+# Shows listed per section on the venue and artist pages
+SHOW_SECTION_LIMIT = 20
+
+def show_sections(show_fk, entity_id, other, other_fk, prefix, limit=SHOW_SECTION_LIMIT):
+  '''
+  Upcoming (soonest first) and past (latest first) shows of one venue or
+  artist, with the other side's id, name and image and the size of each
+  section, in a single query. Each section is a range scan of the
+  (<fk>, start_time) index that stops after limit rows.
+  '''
+  now = datetime.now()
+
+  def section(upcoming):
+    in_section = Show.start_time > now if upcoming else Show.start_time <= now
+    total = db.session.query(db.func.count()).select_from(Show) \
+      .filter(show_fk == entity_id, in_section).scalar_subquery()
+    return db.session.query(
+        db.literal(upcoming).label('upcoming'),
+        total.label('total'),
+        Show.start_time,
+        other.id.label('other_id'),
+        other.name.label('other_name'),
+        other.image_link.label('other_image_link')) \
+      .join(other, other.id == other_fk) \
+      .filter(show_fk == entity_id, in_section) \
+      .order_by(Show.start_time if upcoming else Show.start_time.desc()) \
+      .limit(limit).subquery()
+
+  upcoming, past = section(True), section(False)
+  rows = db.session.execute(db.select(upcoming).union_all(db.select(past))).fetchall()
+
+  sections = {
+    "upcoming_shows": [], "upcoming_shows_count": 0,
+    "past_shows": [], "past_shows_count": 0,
+  }
+  for row in rows:
+    key = 'upcoming_shows' if row.upcoming else 'past_shows'
+    sections[key + '_count'] = row.total
+    sections[key].append({
+      prefix + "_id": row.other_id,
+      prefix + "_name": row.other_name,
+      prefix + "_image_link": row.other_image_link,
+      "start_time": row.start_time,
+    })
+  return sections
+
+def cached_page(kind, id, render):
+  # pages carrying flashed messages are rendered for this request only
+  if session.get('_flashes'):
+    return render()
+  return page_cache.get_or_render(kind, id, render)
+
+def invalidate_pages(venue_ids=(), artist_ids=()):
+  page_cache.bump('venue', *venue_ids)
+  page_cache.bump('artist', *artist_ids)
+
+def show_partners(column, filter):
+  return [id for id, in db.session.query(column).filter(filter).distinct()]
+
+# /shows page size
+SHOWS_PER_PAGE = 30
+SHOWS_MAX_PER_PAGE = 100
+
+# /artists and /venues page size
+BROWSE_PER_PAGE = 50
+BROWSE_MAX_PER_PAGE = 200
+
+def encode_cursor(values):
+  # opaque cursor holding the sort key of the last row on a page
+  raw = json.dumps(values, separators=(',', ':')).encode()
+  return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, *types):
+  # the values, which must have the given types (json gives str and int)
+  try:
+    values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+  except (binascii.Error, ValueError):
+    abort(400)
+  if not isinstance(values, list) or len(values) != len(types):
+    abort(400)
+  for value, type_ in zip(values, types):
+    if not isinstance(value, type_) or isinstance(value, bool):
+      abort(400)
+  return values
+
+def encode_show_cursor(start_time, show_id):
+  return encode_cursor([start_time.isoformat(), show_id])
+
+def decode_show_cursor(cursor):
+  start_time, show_id = decode_cursor(cursor, str, int)
+  try:
+    return datetime.fromisoformat(start_time), show_id
+  except ValueError:
+    abort(400)
+
+def get_limit(default, maximum):
+  limit = request.args.get('limit', default, type=int)
+  if limit < 1:
+    abort(400)
+  return min(limit, maximum)
+
+def parse_day(value):
+  try:
+    return datetime.strptime(value, '%Y-%m-%d')
+  except ValueError:
+    abort(400)
+
+def parse_datetime(value):
+  # times are stored naive, in the server's local time like datetime.now(),
+  # so a time with an offset is converted and its offset dropped
+  parsed = dateutil.parser.parse(value)
+  if parsed.tzinfo is not None:
+    parsed = parsed.astimezone().replace(tzinfo=None)
+  return parsed
+
+def with_genre(query, link_table, link_column, id_column, genre):
+  # joins through the (genre_id, <id>) index of the link table
+  genre_id = db.session.query(Genre.id) \
+    .filter(db.func.lower(Genre.name) == genre.lower()).scalar_subquery()
+  return query.join(link_table, link_column == id_column) \
+    .filter(link_table.c.genre_id == genre_id)
+
+def upcoming_count(show_fk, id_column):
+  # served by the (<fk>, start_time) index of Show
+  return db.session.query(db.func.count()).select_from(Show) \
+    .filter(show_fk == id_column, Show.start_time > datetime.now()) \
+    .scalar_subquery()
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -85,128 +347,99 @@ def index():
 
 @app.route('/venues')
 def venues():
-  # TODO: replace with real venues data.
-  #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-  data=[{
-    "city": "San Francisco",
-    "state": "CA",
-    "venues": [{
-      "id": 1,
-      "name": "The Musical Hop",
-      "num_upcoming_shows": 0,
-    }, {
-      "id": 3,
-      "name": "Park Square Live Music & Coffee",
-      "num_upcoming_shows": 1,
-    }]
-  }, {
-    "city": "New York",
-    "state": "NY",
-    "venues": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }]
-  return render_template('pages/venues.html', areas=data);
+  # Venues grouped by area, a page at a time: ?genre=&state=&cursor=&limit=
+  # One query, ordered by the (state, city) index, with each venue's count of
+  # upcoming shows taken from the (venue_id, start_time) index.
+  limit = get_limit(BROWSE_PER_PAGE, BROWSE_MAX_PER_PAGE)
+  query = db.session.query(
+    Venue.city,
+    Venue.state,
+    Venue.id,
+    Venue.name,
+    upcoming_count(Show.venue_id, Venue.id).label('num_upcoming_shows'))
+
+  filters = {key: request.args[key] for key in ('genre', 'state') if request.args.get(key)}
+  if 'state' in filters:
+    query = query.filter(Venue.state == filters['state'].upper())
+  if 'genre' in filters:
+    query = with_genre(query, venue_genres, venue_genres.c.venue_id, Venue.id, filters['genre'])
+
+  cursor = request.args.get('cursor')
+  if cursor:
+    query = query.filter(db.tuple_(Venue.state, Venue.city, Venue.id) > tuple(decode_cursor(cursor, str, str, int)))
+
+  rows = query.order_by(Venue.state, Venue.city, Venue.id).limit(limit + 1).all()
+  next_url = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    last = rows[-1]
+    next_url = url_for('venues', cursor=encode_cursor([last.state, last.city, last.id]),
+                       limit=limit, **filters)
+
+  data = []
+  for (city, state), area_venues in groupby(rows, key=lambda row: (row.city, row.state)):
+    data.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": venue.id,
+        "name": venue.name,
+        "num_upcoming_shows": venue.num_upcoming_shows,
+      } for venue in area_venues]
+    })
+  return render_template('pages/venues.html', areas=data, next_url=next_url)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
-  # TODO: implement search on venues with partial string search. Ensure it is case-insensitive.
+  # ranked, case-insensitive partial match on name, city, state and genres (see search.py)
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  response={
-    "count": 1,
-    "data": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  search_term = request.form.get('search_term', '')
+  response = search.search(db.session, 'venue', search_term)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@app.route('/autocomplete')
+def autocomplete():
+  # typeahead for the search boxes: ?q=<prefix>&limit=<names per kind>
+  q = request.args.get('q', '')
+  limit = request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int)
+  if limit < 1:
+    abort(400)
+  limit = min(limit, AUTOCOMPLETE_MAX_LIMIT)
+
+  if name_index.needs_load():
+    name_index.load_in_background(app, name_rows)
+  if name_index.complete:
+    venues = name_index.complete_prefix('venue', q, limit)
+    artists = name_index.complete_prefix('artist', q, limit)
+  else:
+    # not loaded yet, or too many names to keep in memory: ask the database
+    venues = search.search(db.session, 'venue', q, limit)['data']
+    artists = search.search(db.session, 'artist', q, limit)['data']
+  return jsonify({
+    "venues": [{"id": v["id"], "name": v["name"]} for v in venues],
+    "artists": [{"id": a["id"], "name": a["name"]} for a in artists],
+  })
 
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  data1={
-    "id": 1,
-    "name": "The Musical Hop",
-    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    "address": "1015 Folsom Street",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "123-123-1234",
-    "website": "https://www.themusicalhop.com",
-    "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    "seeking_talent": True,
-    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-    "past_shows": [{
-      "artist_id": 4,
-      "artist_name": "Guns N Petals",
-      "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
+  return cached_page('venue', venue_id, lambda: render_venue(venue_id))
+
+def render_venue(venue_id):
+  venue = Venue.query.get_or_404(venue_id)
+  data = {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": [genre.name for genre in venue.genres],
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "facebook_link": venue.facebook_link,
+    "image_link": venue.image_link,
   }
-  data2={
-    "id": 2,
-    "name": "The Dueling Pianos Bar",
-    "genres": ["Classical", "R&B", "Hip-Hop"],
-    "address": "335 Delancey Street",
-    "city": "New York",
-    "state": "NY",
-    "phone": "914-003-1132",
-    "website": "https://www.theduelingpianos.com",
-    "facebook_link": "https://www.facebook.com/theduelingpianos",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 3,
-    "name": "Park Square Live Music & Coffee",
-    "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
-    "address": "34 Whiskey Moore Ave",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "415-000-1234",
-    "website": "https://www.parksquarelivemusicandcoffee.com",
-    "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    "past_shows": [{
-      "artist_id": 5,
-      "artist_name": "Matt Quevedo",
-      "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [{
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 1,
-  }
-  data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
+  data.update(show_sections(Show.venue_id, venue_id, Artist, Show.artist_id, 'artist'))
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -219,133 +452,97 @@ def create_venue_form():
 
 @app.route('/venues/create', methods=['POST'])
 def create_venue_submission():
-  # TODO: insert form data as a new Venue record in the db, instead
-  # TODO: modify data to be the data object returned from db insertion
-
-  # on successful db insert, flash success
-  flash('Venue ' + request.form['name'] + ' was successfully listed!')
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
-  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  venue = Venue()
+  fill_venue(venue, request.form)
+  try:
+    db.session.add(venue)
+    db.session.commit()
+    name_index.add('venue', venue.id, venue.name)
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  except Exception:
+    db.session.rollback()
+    app.logger.exception('Could not create venue')
+    flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
   return render_template('pages/home.html')
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
-  # TODO: Complete this endpoint for taking a venue_id, and using
-  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
-
-  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-  # clicking that button delete it from the db then redirect the user to the homepage
-  return None
+  venue = Venue.query.get_or_404(venue_id)
+  try:
+    artist_ids = show_partners(Show.artist_id, Show.venue_id == venue.id)
+    Show.query.filter_by(venue_id=venue.id).delete()
+    db.session.delete(venue)
+    db.session.commit()
+    name_index.remove('venue', int(venue_id))
+    invalidate_pages(venue_ids=[int(venue_id)], artist_ids=artist_ids)
+    schedules.invalidate('venue', int(venue_id))
+    schedules.invalidate('artist', *artist_ids)
+  except Exception:
+    db.session.rollback()
+    app.logger.exception('Could not delete venue %s', venue_id)
+    abort(500)
+  finally:
+    db.session.close()
+  return jsonify({"success": True})
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-  # TODO: replace with real data returned from querying the database
-  data=[{
-    "id": 4,
-    "name": "Guns N Petals",
-  }, {
-    "id": 5,
-    "name": "Matt Quevedo",
-  }, {
-    "id": 6,
-    "name": "The Wild Sax Band",
-  }]
-  return render_template('pages/artists.html', artists=data)
+  # Artists by id, a page at a time: ?genre=&state=&cursor=&limit=
+  limit = get_limit(BROWSE_PER_PAGE, BROWSE_MAX_PER_PAGE)
+  query = db.session.query(
+    Artist.id,
+    Artist.name,
+    upcoming_count(Show.artist_id, Artist.id).label('num_upcoming_shows'))
+
+  filters = {key: request.args[key] for key in ('genre', 'state') if request.args.get(key)}
+  if 'state' in filters:
+    query = query.filter(Artist.state == filters['state'].upper())
+  if 'genre' in filters:
+    query = with_genre(query, artist_genres, artist_genres.c.artist_id, Artist.id, filters['genre'])
+
+  cursor = request.args.get('cursor')
+  if cursor:
+    last_id, = decode_cursor(cursor, int)
+    query = query.filter(Artist.id > last_id)
+
+  data = query.order_by(Artist.id).limit(limit + 1).all()
+  next_url = None
+  if len(data) > limit:
+    data = data[:limit]
+    next_url = url_for('artists', cursor=encode_cursor([data[-1].id]), limit=limit, **filters)
+  return render_template('pages/artists.html', artists=data, next_url=next_url)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # ranked, case-insensitive partial match on name, city, state and genres (see search.py)
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  response={
-    "count": 1,
-    "data": [{
-      "id": 4,
-      "name": "Guns N Petals",
-      "num_upcoming_shows": 0,
-    }]
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  search_term = request.form.get('search_term', '')
+  response = search.search(db.session, 'artist', search_term)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
   # shows the artist page with the given artist_id
-  # TODO: replace with real artist data from the artist table, using artist_id
-  data1={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "past_shows": [{
-      "venue_id": 1,
-      "venue_name": "The Musical Hop",
-      "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
+  return cached_page('artist', artist_id, lambda: render_artist(artist_id))
+
+def render_artist(artist_id):
+  artist = Artist.query.get_or_404(artist_id)
+  data = {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": [genre.name for genre in artist.genres],
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "facebook_link": artist.facebook_link,
+    "image_link": artist.image_link,
   }
-  data2={
-    "id": 5,
-    "name": "Matt Quevedo",
-    "genres": ["Jazz"],
-    "city": "New York",
-    "state": "NY",
-    "phone": "300-400-5000",
-    "facebook_link": "https://www.facebook.com/mattquevedo923251523",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "past_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 6,
-    "name": "The Wild Sax Band",
-    "genres": ["Jazz", "Classical"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "432-325-5432",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "past_shows": [],
-    "upcoming_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 3,
-  }
-  data = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
+  data.update(show_sections(Show.artist_id, artist_id, Venue, Show.venue_id, 'venue'))
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -371,9 +568,24 @@ def edit_artist(artist_id):
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-  # TODO: take values from the form submitted, and update existing
-  # artist record with ID <artist_id> using the new attributes
-
+  artist = Artist.query.get_or_404(artist_id)
+  shown = (artist.name, artist.image_link)
+  fill_artist(artist, request.form)
+  try:
+    db.session.commit()
+    name_index.add('artist', artist_id, request.form['name'])
+    # venue pages list the name and image of the artists playing there
+    venue_ids = []
+    if (artist.name, artist.image_link) != shown:
+      venue_ids = show_partners(Show.venue_id, Show.artist_id == artist_id)
+    invalidate_pages(venue_ids=venue_ids, artist_ids=[artist_id])
+    flash('Artist ' + request.form['name'] + ' was successfully updated!')
+  except Exception:
+    db.session.rollback()
+    app.logger.exception('Could not update artist %s', artist_id)
+    flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated.')
+  finally:
+    db.session.close()
   return redirect(url_for('show_artist', artist_id=artist_id))
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
@@ -398,8 +610,24 @@ def edit_venue(venue_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  # TODO: take values from the form submitted, and update existing
-  # venue record with ID <venue_id> using the new attributes
+  venue = Venue.query.get_or_404(venue_id)
+  shown = (venue.name, venue.image_link)
+  fill_venue(venue, request.form)
+  try:
+    db.session.commit()
+    name_index.add('venue', venue_id, request.form['name'])
+    # artist pages list the name and image of the venues they play
+    artist_ids = []
+    if (venue.name, venue.image_link) != shown:
+      artist_ids = show_partners(Show.artist_id, Show.venue_id == venue_id)
+    invalidate_pages(venue_ids=[venue_id], artist_ids=artist_ids)
+    flash('Venue ' + request.form['name'] + ' was successfully updated!')
+  except Exception:
+    db.session.rollback()
+    app.logger.exception('Could not update venue %s', venue_id)
+    flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
+  finally:
+    db.session.close()
   return redirect(url_for('show_venue', venue_id=venue_id))
 
 #  Create Artist
@@ -413,13 +641,19 @@ def create_artist_form():
 @app.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   # called upon submitting the new artist listing form
-  # TODO: insert form data as a new Venue record in the db, instead
-  # TODO: modify data to be the data object returned from db insertion
-
-  # on successful db insert, flash success
-  flash('Artist ' + request.form['name'] + ' was successfully listed!')
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+  artist = Artist()
+  fill_artist(artist, request.form)
+  try:
+    db.session.add(artist)
+    db.session.commit()
+    name_index.add('artist', artist.id, artist.name)
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  except Exception:
+    db.session.rollback()
+    app.logger.exception('Could not create artist')
+    flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
   return render_template('pages/home.html')
 
 
@@ -428,45 +662,42 @@ def create_artist_submission():
 
 @app.route('/shows')
 def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  data=[{
-    "venue_id": 1,
-    "venue_name": "The Musical Hop",
-    "artist_id": 4,
-    "artist_name": "Guns N Petals",
-    "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "start_time": "2019-05-21T21:30:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 5,
-    "artist_name": "Matt Quevedo",
-    "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "start_time": "2019-06-15T23:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-01T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-08T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-15T20:00:00.000Z"
-  }]
-  return render_template('pages/shows.html', shows=data)
+  # displays list of shows at /shows, by start time, a page at a time
+  # filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD&city=&genre=, paging: ?cursor=&limit=
+  limit = get_limit(SHOWS_PER_PAGE, SHOWS_MAX_PER_PAGE)
+
+  query = db.session.query(
+      Show.id,
+      Show.start_time,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')) \
+    .join(Venue, Venue.id == Show.venue_id) \
+    .join(Artist, Artist.id == Show.artist_id)
+
+  filters = {key: request.args[key] for key in ('from', 'to', 'city', 'genre') if request.args.get(key)}
+  if 'from' in filters:
+    query = query.filter(Show.start_time >= parse_day(filters['from']))
+  if 'to' in filters:
+    query = query.filter(Show.start_time < parse_day(filters['to']) + timedelta(days=1))
+  if 'city' in filters:
+    query = query.filter(db.func.lower(Venue.city) == filters['city'].lower())
+  if 'genre' in filters:
+    query = with_genre(query, artist_genres, artist_genres.c.artist_id, Artist.id, filters['genre'])
+
+  cursor = request.args.get('cursor')
+  if cursor:
+    query = query.filter(db.tuple_(Show.start_time, Show.id) > decode_show_cursor(cursor))
+
+  data = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+  next_url = None
+  if len(data) > limit:
+    data = data[:limit]
+    next_url = url_for('shows', cursor=encode_show_cursor(data[-1].start_time, data[-1].id),
+                       limit=limit, **filters)
+  return render_template('pages/shows.html', shows=data, next_url=next_url)
 
 @app.route('/shows/create')
 def create_shows():
@@ -477,15 +708,91 @@ def create_shows():
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
-  # TODO: insert form data as a new Show record in the db, instead
-
-  # on successful db insert, flash success
-  flash('Show was successfully listed!')
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Show could not be listed.')
-  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  try:
+    artist_id = int(request.form['artist_id'])
+    venue_id = int(request.form['venue_id'])
+    start_time = parse_datetime(request.form['start_time'])
+    duration = int(request.form.get('duration') or SHOW_DEFAULT_MINUTES)
+  except (KeyError, ValueError, OverflowError):
+    flash('An error occurred. Show could not be listed.')
+    return render_template('pages/home.html')
+  if not 0 < duration <= SHOW_MAX_MINUTES:
+    flash('An error occurred. Show could not be listed.')
+    return render_template('pages/home.html')
+  end_time = start_time + timedelta(minutes=duration)
+
+  postgresql = db.engine.dialect.name == 'postgresql'
+  if not postgresql:
+    # no exclusion constraints: book the slot in memory before committing,
+    # so a concurrent request for it sees the booking
+    with schedules.lock:
+      if schedules.get('artist', artist_id).overlaps(start_time, end_time) or \
+          schedules.get('venue', venue_id).overlaps(start_time, end_time):
+        flash('The artist or the venue is already booked at that time. Show could not be listed.')
+        return render_template('pages/home.html')
+      schedules.add('artist', artist_id, start_time, end_time)
+      schedules.add('venue', venue_id, start_time, end_time)
+
+  try:
+    show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time)
+    db.session.add(show)
+    db.session.commit()
+    if postgresql:
+      schedules.add('artist', artist_id, start_time, end_time)
+      schedules.add('venue', venue_id, start_time, end_time)
+    invalidate_pages(venue_ids=[venue_id], artist_ids=[artist_id])
+    flash('Show was successfully listed!')
+  except Exception as e:
+    db.session.rollback()
+    if not postgresql:
+      # give back the slot booked above
+      schedules.invalidate('artist', artist_id)
+      schedules.invalidate('venue', venue_id)
+    if getattr(getattr(e, 'orig', None), 'pgcode', None) == '23P01':
+      # exclusion_violation: an overlapping booking
+      flash('The artist or the venue is already booked at that time. Show could not be listed.')
+    else:
+      app.logger.exception('Could not create show')
+      flash('An error occurred. Show could not be listed.')
+  finally:
+    db.session.close()
   return render_template('pages/home.html')
 
+#  Availability
+#  ----------------------------------------------------------------
+
+def availability(kind, id):
+  # free slots of a venue or artist: ?from=&to= (ISO datetimes, default the
+  # next 7 days) and ?min_minutes= to drop shorter gaps
+  try:
+    window_start = parse_datetime(request.args['from']) if 'from' in request.args else datetime.now()
+    window_end = parse_datetime(request.args['to']) if 'to' in request.args \
+      else window_start + timedelta(days=7)
+  except (ValueError, OverflowError):
+    abort(400)
+  min_minutes = request.args.get('min_minutes', 0, type=int)
+  if window_end <= window_start or window_end - window_start > timedelta(days=AVAILABILITY_MAX_DAYS) \
+      or min_minutes < 0:
+    abort(400)
+
+  slots = schedules.get(kind, id).free_slots(window_start, window_end, timedelta(minutes=min_minutes))
+  return jsonify({
+    "id": id,
+    "from": window_start.isoformat(),
+    "to": window_end.isoformat(),
+    "free": [{"start": start.isoformat(), "end": end.isoformat()} for start, end in slots],
+  })
+
+@app.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+  Venue.query.get_or_404(venue_id)
+  return availability('venue', venue_id)
+
+@app.route('/artists/<int:artist_id>/availability')
+def artist_availability(artist_id):
+  Artist.query.get_or_404(artist_id)
+  return availability('artist', artist_id)
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -496,13 +803,7 @@ def server_error(error):
 
 
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    init_logging(app)
     app.logger.info('errors')
 
 #----------------------------------------------------------------------------#
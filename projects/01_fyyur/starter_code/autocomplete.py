@@ -0,0 +1,167 @@
+#----------------------------------------------------------------------------#
+# Typeahead index for venue and artist names.
+#
+# One sorted array of (key, id) entries per kind, searched with bisect. Every
+# word of a name starts a key ("the musical hop", "musical hop", "hop"), so a
+# query matches names having a word that begins with it. Such names are
+# always part of what search.search() returns for the same term, so picking
+# a suggestion never leads to an empty search page.
+#
+# The index lives in the process: the first query starts loading it in a
+# background thread and queries go to the database until it is ready. It is
+# updated by the create/edit/delete handlers once their commit succeeds, and
+# reloaded every AUTOCOMPLETE_RELOAD_SECONDS to pick up writes made by other
+# processes. Once a load finds more than AUTOCOMPLETE_MAX_NAMES names, the
+# index is never reloaded and queries keep going to the database.
+#----------------------------------------------------------------------------#
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+# Bounds memory; past this many names queries go to the database instead
+AUTOCOMPLETE_MAX_NAMES = int(os.environ.get('AUTOCOMPLETE_MAX_NAMES', 200000))
+AUTOCOMPLETE_RELOAD_SECONDS = int(os.environ.get('AUTOCOMPLETE_RELOAD_SECONDS', 300))
+# Only the start of long names is indexed
+KEY_LENGTH = 64
+
+_word_starts = re.compile(r'(?<!\w)\w', re.UNICODE)
+
+
+def _keys(name):
+  name = ' '.join(name.lower().split())
+  return {name[match.start():match.start() + KEY_LENGTH]
+          for match in _word_starts.finditer(name)}
+
+
+class PrefixIndex:
+
+  def __init__(self, max_names=AUTOCOMPLETE_MAX_NAMES, reload_seconds=AUTOCOMPLETE_RELOAD_SECONDS,
+               clock=time.monotonic):
+    self.max_names = max_names
+    self.reload_seconds = reload_seconds
+    self.clock = clock
+    # One sorted array of (key, id) per kind, and the name of every (kind, id)
+    self._entries = {}
+    self._names = {}
+    self._complete = False
+    self._loaded_at = None
+    self._loading = False
+    self._lock = threading.Lock()
+
+  def load(self, rows):
+    '''
+    Replaces the index with rows of (kind, id, name).
+    '''
+    names = {}
+    complete = True
+    for kind, id, name in rows:
+      if not name:
+        continue
+      if len(names) >= self.max_names:
+        complete = False
+        break
+      names[(kind, id)] = name
+
+    entries = {}
+    for (kind, id), name in names.items():
+      entries.setdefault(kind, []).extend((key, id) for key in _keys(name))
+    for kind_entries in entries.values():
+      kind_entries.sort()
+
+    with self._lock:
+      self._entries = entries
+      self._names = names
+      self._complete = complete
+      self._loaded_at = self.clock()
+
+  def load_in_background(self, app, rows):
+    '''
+    Loads rows() in a thread with an application context, unless a load is
+    already running.
+    '''
+    with self._lock:
+      if self._loading:
+        return
+      self._loading = True
+
+    def run():
+      try:
+        with app.app_context():
+          self.load(rows())
+      finally:
+        self._loading = False
+
+    threading.Thread(target=run, name='autocomplete-load', daemon=True).start()
+
+  def needs_load(self):
+    if self._loaded_at is None:
+      return True
+    # too many names: a reload would only find more
+    if not self._complete:
+      return False
+    return self.clock() - self._loaded_at >= self.reload_seconds
+
+  @property
+  def complete(self):
+    '''
+    False when AUTOCOMPLETE_MAX_NAMES was reached and names are missing.
+    '''
+    return self._complete
+
+  def _remove_locked(self, kind, id):
+    name = self._names.pop((kind, id), None)
+    if name is None:
+      return
+    entries = self._entries[kind]
+    for key in _keys(name):
+      i = bisect_left(entries, (key, id))
+      if i < len(entries) and entries[i] == (key, id):
+        del entries[i]
+
+  def add(self, kind, id, name):
+    '''
+    Inserts a record, or renames it when it is already indexed.
+    '''
+    with self._lock:
+      self._remove_locked(kind, id)
+      if not name:
+        return
+      if len(self._names) >= self.max_names:
+        self._complete = False
+        return
+      self._names[(kind, id)] = name
+      entries = self._entries.setdefault(kind, [])
+      for key in _keys(name):
+        insort(entries, (key, id))
+
+  def remove(self, kind, id):
+    with self._lock:
+      self._remove_locked(kind, id)
+
+  def complete_prefix(self, kind, prefix, limit=AUTOCOMPLETE_LIMIT):
+    '''
+    Returns up to limit [{"id", "name"}] of kind with a word starting with
+    prefix, ordered by the matching word.
+    '''
+    prefix = ' '.join(prefix.lower().split())[:KEY_LENGTH]
+    if not prefix:
+      return []
+    results = []
+    seen = set()
+    with self._lock:
+      entries = self._entries.get(kind, [])
+      i = bisect_left(entries, (prefix,))
+      while i < len(entries) and len(results) < limit:
+        key, id = entries[i]
+        if not key.startswith(prefix):
+          break
+        i += 1
+        if id not in seen:
+          seen.add(id)
+          results.append({"id": id, "name": self._names[(kind, id)]})
+    return results
@@ -0,0 +1,64 @@
+#----------------------------------------------------------------------------#
+# format_datetime benchmark.
+#
+# Renders a list of shows through the datetime filter, first with the
+# original implementation (dateutil parse + babel.dates.format_datetime on
+# every call), then with the cached one in app.py.
+#
+#   python bench_format_datetime.py [shows] [renders]
+#----------------------------------------------------------------------------#
+
+import sys
+import time
+from datetime import datetime, timedelta
+import babel.dates
+import dateutil.parser
+from app import app, format_datetime, _format_datetime
+
+TEMPLATE = "{% for show in shows %}<h6>{{ show.start_time|datetime('full') }}</h6>{% endfor %}"
+
+
+def format_datetime_uncached(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def time_renders(template, shows, renders):
+  start = time.perf_counter()
+  for _ in range(renders):
+    template.render(shows=shows)
+  return (time.perf_counter() - start) / renders
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  renders = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+  # a show every two hours, like a busy /shows page
+  first = datetime(2026, 5, 21, 21, 30)
+  times = [first + timedelta(hours=2 * i) for i in range(count)]
+  iso_shows = [{"start_time": t.isoformat()} for t in times]
+  native_shows = [{"start_time": t} for t in times]
+
+  env = app.jinja_env.overlay()
+  env.filters['datetime'] = format_datetime_uncached
+  template = env.from_string(TEMPLATE)
+  expected = template.render(shows=iso_shows)
+  before = time_renders(template, iso_shows, renders)
+
+  env.filters['datetime'] = format_datetime
+  template = env.from_string(TEMPLATE)
+  assert template.render(shows=native_shows) == expected
+  assert template.render(shows=iso_shows) == expected
+
+  _format_datetime.cache_clear()
+  cold = time_renders(template, native_shows, 1)
+  warm = time_renders(template, native_shows, renders)
+
+  print('{} shows per render'.format(count))
+  print('before:             {:8.2f} ms'.format(before * 1000))
+  print('after, cold cache:  {:8.2f} ms'.format(cold * 1000))
+  print('after, warm cache:  {:8.2f} ms'.format(warm * 1000))
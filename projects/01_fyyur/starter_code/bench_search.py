@@ -0,0 +1,73 @@
+#----------------------------------------------------------------------------#
+# Search benchmark.
+#
+# Fills the database pointed to by DATABASE_URL with synthetic venues and
+# artists (after `flask db upgrade`) and times the search queries.
+#
+#   python bench_search.py [rows] [repeat]
+#----------------------------------------------------------------------------#
+
+import random
+import sys
+import time
+from app import app, db, Venue, Artist
+import search
+
+WORDS = ['musical', 'hop', 'dueling', 'pianos', 'park', 'square', 'live', 'music',
+         'coffee', 'wild', 'sax', 'band', 'guns', 'petals', 'jazz', 'blues', 'hall',
+         'club', 'lounge', 'garden', 'theatre', 'room', 'cellar', 'stage']
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+          ('Seattle', 'WA'), ('Chicago', 'IL'), ('Nashville', 'TN')]
+GENRES = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk', 'Rock n Roll', 'Blues', 'Hip-Hop']
+TERMS = ['Hop', 'music', 'sax band', 'jazz', 'Nashville', 'petal', 'xyz']
+BATCH_SIZE = 10000
+
+
+def rows(count, start_id):
+  rng = random.Random(start_id)
+  for i in range(count):
+    city, state = rng.choice(CITIES)
+    yield {
+      'id': start_id + i,
+      'name': ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4))),
+      'city': city,
+      'state': state,
+      'genres': ','.join(rng.sample(GENRES, 2)),
+    }
+
+
+def fill(model, count):
+  start_id = (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+  batch = []
+  for row in rows(count, start_id):
+    batch.append(row)
+    if len(batch) == BATCH_SIZE:
+      db.session.execute(model.__table__.insert(), batch)
+      batch = []
+  if batch:
+    db.session.execute(model.__table__.insert(), batch)
+  db.session.commit()
+
+
+def bench(kind, repeat):
+  for term in TERMS:
+    timings = []
+    for _ in range(repeat):
+      start = time.perf_counter()
+      result = search.search(db.session, kind, term)
+      timings.append(time.perf_counter() - start)
+    timings.sort()
+    print('{:7} {:12} {:>8} matches  median {:8.2f} ms  max {:8.2f} ms'.format(
+      kind, repr(term), result['count'],
+      timings[len(timings) // 2] * 1000, timings[-1] * 1000))
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+  with app.app_context():
+    for kind, model in (('venue', Venue), ('artist', Artist)):
+      start = time.perf_counter()
+      fill(model, count)
+      print('inserted {} {} rows in {:.1f} s'.format(count, kind, time.perf_counter() - start))
+      bench(kind, repeat)
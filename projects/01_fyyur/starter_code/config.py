@@ -9,5 +9,24 @@ DEBUG = True
 # Connect to the database
 
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = '<Put your local database url>'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://localhost:5432/fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Rendered venue and artist pages. The TTL bounds how long a show can be
+# listed as upcoming after it started.
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')  # or 'shm'
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', '/dev/shm/fyyur-page-cache')
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 1024))
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 60))
+
+# error.log, written by a background thread (see log_pipeline.py)
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # or 'json', one object per line
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_QUEUE_FULL = os.environ.get('LOG_QUEUE_FULL', 'drop')  # or 'block'
+LOG_QUEUE_BLOCK_SECONDS = float(os.environ.get('LOG_QUEUE_BLOCK_SECONDS', 0.05))
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 256))
+LOG_FLUSH_SECONDS = float(os.environ.get('LOG_FLUSH_SECONDS', 0.5))
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_ROTATE_SECONDS = int(os.environ.get('LOG_ROTATE_SECONDS', 24 * 60 * 60))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
@@ -0,0 +1,227 @@
+#----------------------------------------------------------------------------#
+# Non-blocking log file pipeline.
+#
+# Request threads only put records on a bounded queue (QueueHandler). One
+# background thread drains it, formats records in batches and writes each
+# batch with a single write to a file rotated by size and by age.
+#
+# When the queue is full, LOG_QUEUE_FULL decides:
+#   drop   the record is discarded at once (default)
+#   block  the request thread waits up to LOG_QUEUE_BLOCK_SECONDS for room,
+#          then drops the record
+#
+# The number of dropped records, and of records lost to failed writes, is
+# written to the log with the next batch that gets written.
+#----------------------------------------------------------------------------#
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler
+
+
+class DroppingQueueHandler(QueueHandler):
+
+  def __init__(self, log_queue, policy='drop', block_seconds=0.05):
+    super().__init__(log_queue)
+    if policy not in ('drop', 'block'):
+      raise ValueError('unknown queue full policy: %s' % policy)
+    self.policy = policy
+    self.block_seconds = block_seconds
+    self.dropped = 0
+    self._dropped_lock = threading.Lock()
+
+  def prepare(self, record):
+    # Only resolve the message, which may refer to objects that change
+    # later; formatting (tracebacks included) happens on the writer thread.
+    record = logging.makeLogRecord(record.__dict__)
+    record.msg = record.getMessage()
+    record.args = None
+    return record
+
+  def enqueue(self, record):
+    try:
+      if self.policy == 'block':
+        self.queue.put(record, timeout=self.block_seconds)
+      else:
+        self.queue.put_nowait(record)
+    except queue.Full:
+      with self._dropped_lock:
+        self.dropped += 1
+
+  def count_dropped(self, count):
+    with self._dropped_lock:
+      self.dropped += count
+
+  def take_dropped(self):
+    with self._dropped_lock:
+      dropped, self.dropped = self.dropped, 0
+    return dropped
+
+
+class RotatingWriter:
+  '''
+  Appends to path, moving it to path.1 (path.1 to path.2 and so on, keeping
+  backup_count files) once it exceeds max_bytes or is rotate_seconds old.
+  '''
+
+  def __init__(self, path, max_bytes, rotate_seconds, backup_count, clock=time.time):
+    self.path = path
+    self.max_bytes = max_bytes
+    self.rotate_seconds = rotate_seconds
+    self.backup_count = backup_count
+    self.clock = clock
+    self._open()
+
+  def _open(self):
+    self.stream = open(self.path, 'a', encoding='utf-8')
+    self.size = self.stream.tell()
+    self.opened_at = self.clock()
+
+  def write(self, text):
+    data_size = len(text.encode('utf-8'))
+    if self.size and (
+        (self.max_bytes and self.size + data_size > self.max_bytes) or
+        (self.rotate_seconds and self.clock() - self.opened_at >= self.rotate_seconds)):
+      try:
+        self.rotate()
+      except OSError:
+        # rotate() reopened the current file; keep appending to it and try
+        # again at the next write
+        pass
+    self.stream.write(text)
+    self.stream.flush()
+    self.size += data_size
+
+  def rotate(self):
+    self.stream.close()
+    try:
+      if self.backup_count:
+        for i in range(self.backup_count - 1, 0, -1):
+          source = '%s.%d' % (self.path, i)
+          if os.path.exists(source):
+            os.replace(source, '%s.%d' % (self.path, i + 1))
+        os.replace(self.path, self.path + '.1')
+      else:
+        os.remove(self.path)
+    finally:
+      self._open()
+
+  def close(self):
+    self.stream.close()
+
+
+class JsonFormatter(logging.Formatter):
+  # one JSON object per line
+
+  def format(self, record):
+    entry = {
+      'time': self.formatTime(record),
+      'level': record.levelname,
+      'logger': record.name,
+      'message': record.getMessage(),
+      'path': record.pathname,
+      'line': record.lineno,
+    }
+    if record.exc_info:
+      entry['exception'] = self.formatException(record.exc_info)
+    return json.dumps(entry)
+
+
+class BatchingListener:
+
+  _stop = object()
+
+  def __init__(self, log_queue, handler, writer, formatter, batch_size=256, flush_seconds=0.5):
+    self.queue = log_queue
+    self.handler = handler
+    self.writer = writer
+    self.formatter = formatter
+    self.batch_size = batch_size
+    self.flush_seconds = flush_seconds
+    self._thread = None
+
+  def start(self):
+    self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+    self._thread.start()
+
+  def stop(self, timeout=5.0):
+    # writes out what is queued, then closes the file; waits at most timeout
+    # seconds so a full queue or a stuck write cannot hang the exit
+    if self._thread is None:
+      return
+    deadline = time.monotonic() + timeout
+    try:
+      self.queue.put(self._stop, timeout=timeout)
+    except queue.Full:
+      pass
+    self._thread.join(max(0, deadline - time.monotonic()))
+    if not self._thread.is_alive():
+      # otherwise the writer may still be in use; the exit closes the file
+      self.writer.close()
+    self._thread = None
+
+  def _format(self, record):
+    try:
+      return self.formatter.format(record) + '\n'
+    except Exception:
+      return 'unformattable log record from %s:%s\n' % (record.pathname, record.lineno)
+
+  def _run(self):
+    stopping = False
+    while not stopping:
+      try:
+        batch = [self.queue.get(timeout=self.flush_seconds)]
+      except queue.Empty:
+        batch = []
+      while batch and len(batch) < self.batch_size:
+        try:
+          batch.append(self.queue.get_nowait())
+        except queue.Empty:
+          break
+      if self._stop in batch:
+        stopping = True
+        batch = [record for record in batch if record is not self._stop]
+
+      lines = [self._format(record) for record in batch]
+      dropped = self.handler.take_dropped()
+      if dropped:
+        lines.append(self._format(logging.makeLogRecord({
+          'name': 'log_pipeline', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+          'msg': 'dropped %d log records: queue full or write failed' % dropped,
+        })))
+      if lines:
+        try:
+          self.writer.write(''.join(lines))
+        except Exception:
+          # reported with the next batch that gets written
+          self.handler.count_dropped(len(batch) + dropped)
+
+
+def init_logging(app):
+  '''
+  Attaches the pipeline to app.logger, configured by the LOG_* settings.
+  '''
+  config = app.config
+  log_queue = queue.Queue(config['LOG_QUEUE_SIZE'])
+  handler = DroppingQueueHandler(log_queue, config['LOG_QUEUE_FULL'], config['LOG_QUEUE_BLOCK_SECONDS'])
+  handler.setLevel(logging.INFO)
+
+  if config['LOG_FORMAT'] == 'json':
+    formatter = JsonFormatter()
+  else:
+    formatter = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+  writer = RotatingWriter(config['LOG_FILE'], config['LOG_MAX_BYTES'],
+                          config['LOG_ROTATE_SECONDS'], config['LOG_BACKUP_COUNT'])
+  listener = BatchingListener(log_queue, handler, writer, formatter,
+                              config['LOG_BATCH_SIZE'], config['LOG_FLUSH_SECONDS'])
+  listener.start()
+  atexit.register(listener.stop)
+
+  app.logger.setLevel(logging.INFO)
+  app.logger.addHandler(handler)
+  return listener
@@ -0,0 +1,75 @@
+"""search indexes for venues and artists
+
+Revision ID: 5c1d2e7f9a10
+Revises: 2bf08806a414
+Create Date: 2026-10-18 20:40:12.118902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1d2e7f9a10'
+down_revision = '2bf08806a414'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = {'Venue': 'venue_search', 'Artist': 'artist_search'}
+
+# Must match search.TSVECTOR
+TSVECTOR = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || "
+    "coalesce(state, '') || ' ' || coalesce(genres, ''))"
+)
+
+FTS_COLUMNS = 'name, city, state, genres'
+
+
+def upgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=True))
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in SEARCH_TABLES:
+            op.execute('CREATE INDEX ix_{lower}_search ON "{table}" USING GIN ({tsv})'
+                       .format(lower=table.lower(), table=table, tsv=TSVECTOR))
+            op.execute('CREATE INDEX ix_{lower}_name_trgm ON "{table}" USING GIN (name gin_trgm_ops)'
+                       .format(lower=table.lower(), table=table))
+    elif dialect == 'sqlite':
+        new_values = ', '.join('new.' + c.strip() for c in FTS_COLUMNS.split(','))
+        old_values = ', '.join('old.' + c.strip() for c in FTS_COLUMNS.split(','))
+        for table, fts in SEARCH_TABLES.items():
+            op.execute("CREATE VIRTUAL TABLE {fts} USING fts5({columns}, content='{table}', "
+                       "content_rowid='id', tokenize='trigram')"
+                       .format(fts=fts, columns=FTS_COLUMNS, table=table))
+            op.execute('INSERT INTO {fts}(rowid, {columns}) SELECT id, {columns} FROM "{table}"'
+                       .format(fts=fts, columns=FTS_COLUMNS, table=table))
+            op.execute('CREATE TRIGGER {fts}_ai AFTER INSERT ON "{table}" BEGIN '
+                       'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END'
+                       .format(fts=fts, table=table, columns=FTS_COLUMNS, new=new_values))
+            op.execute('CREATE TRIGGER {fts}_ad AFTER DELETE ON "{table}" BEGIN '
+                       "INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END"
+                       .format(fts=fts, table=table, columns=FTS_COLUMNS, old=old_values))
+            op.execute('CREATE TRIGGER {fts}_au AFTER UPDATE ON "{table}" BEGIN '
+                       "INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+                       'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END'
+                       .format(fts=fts, table=table, columns=FTS_COLUMNS, old=old_values, new=new_values))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in SEARCH_TABLES:
+            op.execute('DROP INDEX IF EXISTS ix_{lower}_name_trgm'.format(lower=table.lower()))
+            op.execute('DROP INDEX IF EXISTS ix_{lower}_search'.format(lower=table.lower()))
+    elif dialect == 'sqlite':
+        for fts in SEARCH_TABLES.values():
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {fts}_{suffix}'.format(fts=fts, suffix=suffix))
+            op.execute('DROP TABLE IF EXISTS {fts}'.format(fts=fts))
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.drop_column('genres')
@@ -0,0 +1,88 @@
+"""normalized genres
+
+Revision ID: c03d47dd132b
+Revises: 8e4b6a1f3c27
+Create Date: 2026-10-18 21:26:57.893737
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c03d47dd132b'
+down_revision = '8e4b6a1f3c27'
+branch_labels = None
+depends_on = None
+
+# the choices of the genre fields in forms.py
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    with op.batch_alter_table('artist_genres', schema=None) as batch_op:
+        batch_op.create_index('ix_artist_genres_genre_id_artist_id', ['genre_id', 'artist_id'], unique=False)
+
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    with op.batch_alter_table('venue_genres', schema=None) as batch_op:
+        batch_op.create_index('ix_venue_genres_genre_id_venue_id', ['genre_id', 'venue_id'], unique=False)
+
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.create_index('ix_artist_state', ['state'], unique=False)
+
+    # Move the comma separated genres into the link tables. The text column
+    # stays as the copy indexed for full-text search.
+    bind = op.get_bind()
+    names = set(GENRES)
+    links = {'Artist': [], 'Venue': []}
+    for table in links:
+        for id, genres in bind.execute(sa.text('SELECT id, genres FROM "%s" WHERE genres IS NOT NULL' % table)):
+            for name in set(name.strip() for name in genres.split(',') if name.strip()):
+                names.add(name)
+                links[table].append((id, name))
+
+    op.bulk_insert(genre, [{'name': name} for name in sorted(names)])
+    genre_ids = dict((name, id) for id, name in bind.execute(sa.text('SELECT id, name FROM "Genre"')))
+    for table, link_table, column in (('Artist', 'artist_genres', 'artist_id'),
+                                      ('Venue', 'venue_genres', 'venue_id')):
+        if links[table]:
+            op.bulk_insert(sa.table(link_table, sa.column(column), sa.column('genre_id')),
+                           [{column: id, 'genre_id': genre_ids[name]} for id, name in links[table]])
+
+
+def downgrade():
+    with op.batch_alter_table('Artist', schema=None) as batch_op:
+        batch_op.drop_index('ix_artist_state')
+
+    with op.batch_alter_table('venue_genres', schema=None) as batch_op:
+        batch_op.drop_index('ix_venue_genres_genre_id_venue_id')
+
+    op.drop_table('venue_genres')
+    with op.batch_alter_table('artist_genres', schema=None) as batch_op:
+        batch_op.drop_index('ix_artist_genres_genre_id_artist_id')
+
+    op.drop_table('artist_genres')
+    op.drop_table('Genre')
@@ -0,0 +1,71 @@
+"""show end time and overlapping booking constraints
+
+Revision ID: d7a9e3b05f41
+Revises: f2c8b1d4e6a3
+Create Date: 2026-10-18 22:02:14.551630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a9e3b05f41'
+down_revision = 'f2c8b1d4e6a3'
+branch_labels = None
+depends_on = None
+
+# existing shows get the default duration
+DEFAULT_MINUTES = 120
+
+
+def upgrade():
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('end_time', sa.DateTime(), nullable=True))
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("UPDATE \"Show\" SET end_time = start_time + interval '%d minutes'" % DEFAULT_MINUTES)
+    else:
+        op.execute("UPDATE \"Show\" SET end_time = datetime(start_time, '+%d minutes')" % DEFAULT_MINUTES)
+
+    # the default duration can run into the next show of the same venue or
+    # artist, which the constraints below would reject: such shows end when
+    # the next one starts. Of shows starting together, all but the last (by
+    # id) are left without a duration.
+    for column in ('venue_id', 'artist_id'):
+        op.execute('''
+            UPDATE "Show" SET end_time = (
+                SELECT min(next.start_time) FROM "Show" next
+                WHERE next.{column} = "Show".{column} AND next.start_time < "Show".end_time
+                  AND (next.start_time > "Show".start_time
+                       OR next.start_time = "Show".start_time AND next.id > "Show".id))
+            WHERE EXISTS (
+                SELECT 1 FROM "Show" next
+                WHERE next.{column} = "Show".{column} AND next.start_time < "Show".end_time
+                  AND (next.start_time > "Show".start_time
+                       OR next.start_time = "Show".start_time AND next.id > "Show".id))
+        '''.format(column=column))
+
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+
+    if dialect == 'postgresql':
+        # btree_gist provides the GiST equality operator on the integer ids.
+        # start_time is a timestamp without time zone, so the ranges are
+        # tsrange: tstzrange over it would not be immutable.
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in ('venue_id', 'artist_id'):
+            op.execute('ALTER TABLE "Show" ADD CONSTRAINT show_{column}_no_overlap '
+                       'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)'
+                       .format(column=column))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in ('venue_id', 'artist_id'):
+            op.execute('ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS show_{column}_no_overlap'
+                       .format(column=column))
+
+    with op.batch_alter_table('Show', schema=None) as batch_op:
+        batch_op.drop_column('end_time')
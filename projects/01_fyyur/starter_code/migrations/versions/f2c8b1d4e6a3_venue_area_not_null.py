@@ -0,0 +1,59 @@
+"""venue city and state not null
+
+Revision ID: f2c8b1d4e6a3
+Revises: c03d47dd132b
+Create Date: 2026-10-18 21:48:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8b1d4e6a3'
+down_revision = 'c03d47dd132b'
+branch_labels = None
+depends_on = None
+
+# On SQLite batch_alter_table copies Venue into a new table and drops the
+# old one, and with it the venue_search triggers of 5c1d2e7f9a10
+FTS_COLUMNS = 'name, city, state, genres'
+
+
+def restore_venue_search():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    new_values = ', '.join('new.' + c.strip() for c in FTS_COLUMNS.split(','))
+    old_values = ', '.join('old.' + c.strip() for c in FTS_COLUMNS.split(','))
+    op.execute('CREATE TRIGGER IF NOT EXISTS venue_search_ai AFTER INSERT ON "Venue" BEGIN '
+               'INSERT INTO venue_search(rowid, {columns}) VALUES (new.id, {new}); END'
+               .format(columns=FTS_COLUMNS, new=new_values))
+    op.execute('CREATE TRIGGER IF NOT EXISTS venue_search_ad AFTER DELETE ON "Venue" BEGIN '
+               "INSERT INTO venue_search(venue_search, rowid, {columns}) VALUES ('delete', old.id, {old}); END"
+               .format(columns=FTS_COLUMNS, old=old_values))
+    op.execute('CREATE TRIGGER IF NOT EXISTS venue_search_au AFTER UPDATE ON "Venue" BEGIN '
+               "INSERT INTO venue_search(venue_search, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+               'INSERT INTO venue_search(rowid, {columns}) VALUES (new.id, {new}); END'
+               .format(columns=FTS_COLUMNS, old=old_values, new=new_values))
+    # the backfilled cities and states are not in the index yet
+    op.execute("INSERT INTO venue_search(venue_search) VALUES ('rebuild')")
+
+
+def upgrade():
+    # the venue form requires both; older rows without them get an empty area
+    op.execute('UPDATE "Venue" SET city = \'\' WHERE city IS NULL')
+    op.execute('UPDATE "Venue" SET state = \'\' WHERE state IS NULL')
+
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.alter_column('city', existing_type=sa.String(length=120), nullable=False)
+        batch_op.alter_column('state', existing_type=sa.String(length=120), nullable=False)
+
+    restore_venue_search()
+
+
+def downgrade():
+    with op.batch_alter_table('Venue', schema=None) as batch_op:
+        batch_op.alter_column('state', existing_type=sa.String(length=120), nullable=True)
+        batch_op.alter_column('city', existing_type=sa.String(length=120), nullable=True)
+
+    restore_venue_search()
@@ -0,0 +1,147 @@
+#----------------------------------------------------------------------------#
+# Rendered page cache for the venue and artist pages.
+#
+# Pages are stored under (kind, id, version). Writes that change what a page
+# shows replace the version of that page with a new random stamp, so stale
+# copies are never read again and simply age out of the backend. A missing
+# version (never set, or evicted) also gets a new stamp, which keeps an
+# evicted version from resurrecting an old page.
+#
+# Backends:
+#   memory  in-process LRU (default)
+#   shm     files under a tmpfs directory, shared by every worker process
+#----------------------------------------------------------------------------#
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+
+  def __init__(self, max_entries):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      expires, value = entry
+      if expires is not None and expires <= time.time():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    expires = time.time() + ttl if ttl else None
+    with self._lock:
+      self._entries[key] = (expires, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+
+class SharedMemoryCache:
+  # Every entry is one file: a first line holding the expiry time (0 when
+  # there is none), then the value. Files are replaced atomically.
+
+  PRUNE_EVERY = 256
+
+  def __init__(self, max_entries, path):
+    self.max_entries = max_entries
+    self.path = path
+    os.makedirs(path, exist_ok=True)
+    self._writes = 0
+
+  def _file(self, key):
+    return os.path.join(self.path, hashlib.sha1(repr(key).encode()).hexdigest())
+
+  def get(self, key):
+    try:
+      with open(self._file(key), encoding='utf-8') as f:
+        expires = float(f.readline())
+        value = f.read()
+    except (OSError, ValueError):
+      return None
+    if expires and expires <= time.time():
+      return None
+    return value
+
+  def set(self, key, value, ttl=None):
+    expires = time.time() + ttl if ttl else 0
+    fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+      f.write('%r\n' % expires)
+      f.write(value)
+    os.replace(tmp, self._file(key))
+
+    self._writes += 1
+    if self._writes % self.PRUNE_EVERY == 0:
+      self.prune()
+
+  def prune(self):
+    '''
+    Deletes the least recently written files beyond max_entries.
+    '''
+    files = []
+    for entry in os.scandir(self.path):
+      try:
+        files.append((entry.stat().st_mtime, entry.path))
+      except OSError:
+        pass
+    files.sort()
+    for _, path in files[:max(0, len(files) - self.max_entries)]:
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+
+
+class PageCache:
+
+  def __init__(self, backend, ttl):
+    self.backend = backend
+    self.ttl = ttl
+
+  def version(self, kind, id):
+    key = ('version', kind, id)
+    version = self.backend.get(key)
+    if version is None:
+      version = self.bump(kind, id)
+    return version
+
+  def bump(self, kind, *ids):
+    '''
+    Gives the pages of ids a new version, returning the last one.
+    '''
+    version = None
+    for id in ids:
+      version = os.urandom(8).hex()
+      self.backend.set(('version', kind, id), version)
+    return version
+
+  def get_or_render(self, kind, id, render):
+    '''
+    Returns the cached page, or calls render() and caches its output.
+    '''
+    key = ('page', kind, id, self.version(kind, id))
+    page = self.backend.get(key)
+    if page is None:
+      page = render()
+      self.backend.set(key, page, self.ttl)
+    return page
+
+
+def create_page_cache(config):
+  if config.get('PAGE_CACHE_BACKEND') == 'shm':
+    backend = SharedMemoryCache(config['PAGE_CACHE_SIZE'], config['PAGE_CACHE_DIR'])
+  else:
+    backend = MemoryCache(config['PAGE_CACHE_SIZE'])
+  return PageCache(backend, config['PAGE_CACHE_TTL'])
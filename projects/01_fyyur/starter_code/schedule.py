@@ -0,0 +1,114 @@
+#----------------------------------------------------------------------------#
+# Booking schedules of venues and artists.
+#
+# On PostgreSQL overlapping bookings are rejected by exclusion constraints
+# over tsrange(start_time, end_time) (see the migrations). SQLite has no
+# equivalent, so there create_show_submission checks a Schedule first.
+# Schedules also answer the availability endpoints on both databases.
+#
+# A Schedule keeps the busy time of one venue or artist as sorted, disjoint
+# blocks: overlapping or touching bookings are merged when added. For
+# disjoint intervals a sorted array is all an interval tree would give us,
+# so overlap checks are one bisect and a free-slot query is a bisect plus
+# the blocks inside the window.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+# Schedules kept in memory, least recently used first out
+SCHEDULE_CACHE_SIZE = 10000
+# Reloaded from the database after this long, to see other processes' writes
+SCHEDULE_RELOAD_SECONDS = 60
+
+
+class Schedule:
+
+  def __init__(self, bookings=()):
+    self.starts = []
+    self.ends = []
+    for start, end in sorted(bookings):
+      if self.ends and start <= self.ends[-1]:
+        self.ends[-1] = max(self.ends[-1], end)
+      else:
+        self.starts.append(start)
+        self.ends.append(end)
+
+  def overlaps(self, start, end):
+    # the last block starting before end is the only candidate
+    i = bisect_left(self.starts, end) - 1
+    return i >= 0 and self.ends[i] > start
+
+  def add(self, start, end):
+    lo = bisect_left(self.ends, start)
+    hi = bisect_right(self.starts, end)
+    if lo < hi:
+      start = min(start, self.starts[lo])
+      end = max(end, self.ends[hi - 1])
+    self.starts[lo:hi] = [start]
+    self.ends[lo:hi] = [end]
+
+  def free_slots(self, window_start, window_end, min_length=None):
+    '''
+    Returns the free (start, end) slots within the window, skipping slots
+    shorter than min_length (a timedelta).
+    '''
+    slots = []
+    cursor = window_start
+    i = bisect_right(self.ends, window_start)
+    while i < len(self.starts) and self.starts[i] < window_end:
+      if self.starts[i] > cursor:
+        slots.append((cursor, self.starts[i]))
+      cursor = max(cursor, self.ends[i])
+      i += 1
+    if cursor < window_end:
+      slots.append((cursor, window_end))
+    if min_length is not None:
+      slots = [slot for slot in slots if slot[1] - slot[0] >= min_length]
+    return slots
+
+
+class ScheduleCache:
+  '''
+  Schedules by (kind, id), loaded on first use through load(kind, id),
+  which returns the (start, end) bookings of one venue or artist.
+  '''
+
+  def __init__(self, load, max_entries=SCHEDULE_CACHE_SIZE,
+               reload_seconds=SCHEDULE_RELOAD_SECONDS, clock=time.monotonic):
+    self.load = load
+    self.max_entries = max_entries
+    self.reload_seconds = reload_seconds
+    self.clock = clock
+    self._entries = OrderedDict()
+    # held while checking and booking, so two requests cannot take one slot
+    self.lock = threading.RLock()
+
+  def get(self, kind, id):
+    key = (kind, id)
+    with self.lock:
+      entry = self._entries.get(key)
+      if entry is not None and self.clock() - entry[0] < self.reload_seconds:
+        self._entries.move_to_end(key)
+        return entry[1]
+
+      schedule = Schedule(self.load(kind, id))
+      self._entries[key] = (self.clock(), schedule)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+      return schedule
+
+  def add(self, kind, id, start, end):
+    # only schedules already in memory need the booking, others load it
+    with self.lock:
+      entry = self._entries.get((kind, id))
+      if entry is not None:
+        entry[1].add(start, end)
+
+  def invalidate(self, kind, *ids):
+    with self.lock:
+      for id in ids:
+        self._entries.pop((kind, id), None)
@@ -0,0 +1,145 @@
+#----------------------------------------------------------------------------#
+# Venue and artist search.
+#
+# PostgreSQL: a GIN index over a tsvector of name, city, state and genres
+# gives ranked word/prefix matches, and a pg_trgm GIN index on name keeps
+# partial matches ("usic" in "Musical Hop") index-assisted.
+# SQLite (local development): FTS5 tables using the trigram tokenizer,
+# kept in sync with the base tables by triggers (see the migrations).
+# Terms shorter than a trigram, and any other database, fall back to an
+# unindexed case-insensitive LIKE over the same columns.
+#
+# Each search is one round trip returning the ranked page, the total number
+# of matches and the upcoming show count of every returned row.
+#----------------------------------------------------------------------------#
+
+import re
+from datetime import datetime
+from sqlalchemy import text, bindparam, DateTime, column, func, or_, select, table
+
+SEARCH_LIMIT = 50
+
+SEARCHABLE = {
+  'venue': {'table': 'Venue', 'fts': 'venue_search', 'show_fk': 'venue_id'},
+  'artist': {'table': 'Artist', 'fts': 'artist_search', 'show_fk': 'artist_id'},
+}
+
+# Must match the expression of the ix_<table>_search GIN indexes.
+TSVECTOR = (
+  "to_tsvector('simple', coalesce(t.name, '') || ' ' || coalesce(t.city, '') || ' ' || "
+  "coalesce(t.state, '') || ' ' || coalesce(t.genres, ''))"
+)
+
+# The columns of the FTS tables and of the tsvector
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+_words = re.compile(r'\w+', re.UNICODE)
+
+
+def _like_pattern(term):
+  return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _upcoming_count(show_fk):
+  return ('(SELECT count(*) FROM "Show" s WHERE s.{fk} = m.id AND s.start_time > :now)'
+          .format(fk=show_fk))
+
+
+def _postgresql_query(kind, term):
+  spec = SEARCHABLE[kind]
+  words = _words.findall(term.lower())
+  params = {'pattern': _like_pattern(term), 'term': term}
+  if words:
+    matches = '{tsv} @@ to_tsquery(\'simple\', :tsquery) OR t.name ILIKE :pattern'.format(tsv=TSVECTOR)
+    rank = ('ts_rank({tsv}, to_tsquery(\'simple\', :tsquery)) + similarity(t.name, :term)'
+            .format(tsv=TSVECTOR))
+    params['tsquery'] = ' & '.join(word + ':*' for word in words)
+  else:
+    matches = 't.name ILIKE :pattern'
+    rank = 'similarity(t.name, :term)'
+
+  sql = '''
+    WITH m AS (
+      SELECT t.id, t.name, {rank} AS rank, count(*) OVER () AS total
+      FROM "{table}" t
+      WHERE {matches}
+      ORDER BY rank DESC, t.id
+      LIMIT :limit
+    )
+    SELECT m.id, m.name, m.total, {upcoming} AS num_upcoming_shows
+    FROM m
+    ORDER BY m.rank DESC, m.id
+  '''.format(rank=rank, table=spec['table'], matches=matches,
+             upcoming=_upcoming_count(spec['show_fk']))
+  return sql, params
+
+
+def _sqlite_query(kind, term):
+  # The trigram tokenizer matches any substring of at least three characters
+  spec = SEARCHABLE[kind]
+  sql = '''
+    WITH r AS (SELECT rowid AS id, rank FROM {fts} WHERE {fts} MATCH :match),
+    m AS (
+      SELECT t.id, t.name, r.rank, count(*) OVER () AS total
+      FROM r JOIN "{table}" t ON t.id = r.id
+      ORDER BY r.rank, t.id
+      LIMIT :limit
+    )
+    SELECT m.id, m.name, m.total, {upcoming} AS num_upcoming_shows
+    FROM m
+    ORDER BY m.rank, m.id
+  '''.format(fts=spec['fts'], table=spec['table'], upcoming=_upcoming_count(spec['show_fk']))
+  return sql, {'match': '"' + term.replace('"', '""') + '"'}
+
+
+def _like_query(kind, term):
+  '''
+  Unranked LIKE over SEARCH_COLUMNS, built with SQLAlchemy so any
+  database can run it.
+  '''
+  spec = SEARCHABLE[kind]
+  searched = table(spec['table'], *(column(name) for name in ('id',) + SEARCH_COLUMNS))
+  show = table('Show', column(spec['show_fk']), column('start_time'))
+  pattern = _like_pattern(term.lower())
+  matches = select(searched.c.id, searched.c.name, func.count().over().label('total')) \
+    .where(or_(*(func.lower(searched.c[name]).like(pattern, escape='\\') for name in SEARCH_COLUMNS))) \
+    .order_by(searched.c.id).limit(bindparam('limit')).subquery('m')
+  upcoming = select(func.count()).select_from(show) \
+    .where(show.c[spec['show_fk']] == matches.c.id, show.c.start_time > bindparam('now', type_=DateTime())) \
+    .scalar_subquery()
+  return select(matches.c.id, matches.c.name, matches.c.total, upcoming.label('num_upcoming_shows')) \
+    .order_by(matches.c.id)
+
+
+def search(session, kind, term, limit=SEARCH_LIMIT):
+  '''
+  Ranked, case-insensitive partial match of term against venues or artists.
+  kind is 'venue' or 'artist'. Returns the structure the search templates
+  expect: {"count": total matches, "data": [{"id", "name", "num_upcoming_shows"}]}
+  '''
+  term = term.strip()
+  if not term:
+    return {"count": 0, "data": []}
+
+  dialect = session.connection().dialect.name
+  if dialect == 'postgresql':
+    sql, params = _postgresql_query(kind, term)
+  elif dialect == 'sqlite' and len(term) >= 3:
+    sql, params = _sqlite_query(kind, term)
+  else:
+    sql, params = None, {}
+
+  params.update({'limit': limit, 'now': datetime.now()})
+  if sql is None:
+    statement = _like_query(kind, term)
+  else:
+    statement = text(sql).bindparams(bindparam('now', type_=DateTime()))
+  rows = session.execute(statement, params).fetchall()
+  return {
+    "count": rows[0].total if rows else 0,
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "num_upcoming_shows": row.num_upcoming_shows,
+    } for row in rows]
+  }
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+DATABASE_FILE = os.path.join(tempfile.gettempdir(), 'fyyur_test.db')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + DATABASE_FILE)
+
+import flask_migrate
+import search
+from log_pipeline import RotatingWriter
+from app import app, db, Venue, format_datetime, _format_datetime
+
+
+class FormatDatetimeTestCase(unittest.TestCase):
+    """This class represents the datetime filter test case"""
+
+    def setUp(self):
+        _format_datetime.cache_clear()
+
+    def test_same_instant_in_two_zones(self):
+        utc = datetime(2030, 5, 1, 10, 0, tzinfo=timezone.utc)
+        plus_one = datetime(2030, 5, 1, 11, 0, tzinfo=timezone(timedelta(hours=1)))
+        self.assertEqual(utc, plus_one)
+
+        self.assertIn('10:00AM', format_datetime(utc, 'full'))
+        self.assertIn('11:00AM', format_datetime(plus_one, 'full'))
+        self.assertIn('10:00AM', format_datetime(utc, 'full'))
+
+    def test_strings_and_datetimes_agree(self):
+        value = datetime(2030, 5, 1, 21, 30)
+        self.assertEqual(format_datetime(value), format_datetime(value.isoformat()))
+        self.assertEqual(format_datetime(value, 'full'), 'Wednesday May, 1, 2030 at 9:30PM')
+
+
+class RotatingWriterTestCase(unittest.TestCase):
+    """This class represents the log file writer test case"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'error.log')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, path):
+        with open(path, encoding='utf-8') as log_file:
+            return log_file.read()
+
+    def test_rotates_by_size(self):
+        writer = RotatingWriter(self.path, max_bytes=10, rotate_seconds=0, backup_count=2)
+        writer.write('first 123\n')
+        writer.write('second 12\n')
+        writer.close()
+
+        self.assertEqual(self.read(self.path + '.1'), 'first 123\n')
+        self.assertEqual(self.read(self.path), 'second 12\n')
+
+    def test_failed_rotation_keeps_appending(self):
+        writer = RotatingWriter(self.path, max_bytes=10, rotate_seconds=0, backup_count=2)
+        writer.write('first 123\n')
+        with mock.patch('log_pipeline.os.replace', side_effect=PermissionError('locked')):
+            writer.write('second 12\n')
+        writer.write('third 123\n')
+        writer.close()
+
+        self.assertEqual(self.read(self.path + '.1'), 'first 123\nsecond 12\n')
+        self.assertEqual(self.read(self.path), 'third 123\n')
+
+
+@unittest.skipUnless(app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite:///' + DATABASE_FILE,
+                     'migrates a scratch SQLite database')
+class MigrationsTestCase(unittest.TestCase):
+    """This class represents the migrations test case"""
+
+    def setUp(self):
+        with app.app_context():
+            db.engine.dispose()
+        if os.path.exists(DATABASE_FILE):
+            os.remove(DATABASE_FILE)
+        self.directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+        with app.app_context():
+            flask_migrate.upgrade(self.directory)
+
+    def search_venues(self, term):
+        return [venue['id'] for venue in search.search(db.session, 'venue', term)['data']]
+
+    def test_venue_search_follows_edits_after_upgrade(self):
+        with app.app_context():
+            venue = Venue(name='The Quiet Harbour', city='Portland', state='OR')
+            db.session.add(venue)
+            db.session.commit()
+            self.assertEqual(self.search_venues('quiet harbour'), [venue.id])
+
+            venue.name = 'The Loud Lighthouse'
+            db.session.commit()
+            self.assertEqual(self.search_venues('quiet harbour'), [])
+            self.assertEqual(self.search_venues('loud lighthouse'), [venue.id])
+
+            db.session.delete(venue)
+            db.session.commit()
+            self.assertEqual(self.search_venues('loud lighthouse'), [])
+
+    def test_venue_search_follows_edits_after_downgrade(self):
+        with app.app_context():
+            flask_migrate.downgrade(self.directory, revision='c03d47dd132b')
+            db.session.execute(db.text(
+                'INSERT INTO "Venue" (id, name, city, state) VALUES (1, \'Old Mill\', NULL, NULL)'))
+            db.session.execute(db.text('UPDATE "Venue" SET name = \'New Mill\' WHERE id = 1'))
+            db.session.commit()
+            self.assertEqual(self.search_venues('new mill'), [1])
+            self.assertEqual(self.search_venues('old mill'), [])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+'''
+Quiz question selection benchmark.
+
+Fills a SQLite database with a bank of synthetic questions (1M by
+default) in six categories, then times drawing a question that is not
+one of the previous ones with:
+    ORDER BY random()      the usual query
+    draw_sql()             the indexed fallback used while the sampler is cold
+    QuestionSampler.draw() the in-memory sampler
+
+    python bench_quiz.py [questions] [draws]
+'''
+import os
+import random
+import sys
+import time
+from flask import Flask
+
+from models import setup_db, db, Question
+from flaskr.sampler import QuestionSampler, draw_sql
+
+DATABASE = '/tmp/trivia_bench.db'
+CATEGORIES = 6
+PREVIOUS = 5
+BATCH_SIZE = 50000
+
+
+def fill(count):
+  rng = random.Random(0)
+  rows = []
+  for i in range(count):
+    rows.append({
+      'question': 'Question %d?' % i,
+      'answer': 'Answer %d' % i,
+      'category': rng.randint(1, CATEGORIES),
+      'difficulty': rng.randint(1, 5)
+    })
+    if len(rows) == BATCH_SIZE:
+      db.session.execute(Question.__table__.insert(), rows)
+      rows = []
+  if rows:
+    db.session.execute(Question.__table__.insert(), rows)
+  db.session.commit()
+
+
+def order_by_random(category, previous):
+  return db.session.query(Question.id) \
+    .filter(Question.category == category, ~Question.id.in_(previous)) \
+    .order_by(db.func.random()).limit(1).scalar()
+
+
+def bench(name, draw, draws, count):
+  rng = random.Random(1)
+  start = time.perf_counter()
+  for _ in range(draws):
+    previous = set(rng.randint(1, count) for _ in range(PREVIOUS))
+    draw(rng.randint(1, CATEGORIES), previous)
+  elapsed = (time.perf_counter() - start) / draws
+  print('%-22s %10.3f ms per draw' % (name, elapsed * 1000))
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  draws = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+  if os.path.exists(DATABASE):
+    os.remove(DATABASE)
+  app = Flask(__name__)
+  setup_db(app, 'sqlite:///' + DATABASE)
+
+  with app.app_context():
+    start = time.perf_counter()
+    fill(count)
+    print('inserted %d questions in %.1f s' % (count, time.perf_counter() - start))
+
+    sampler = QuestionSampler()
+    start = time.perf_counter()
+    sampler.load()
+    print('loaded the sampler in %.1f s' % (time.perf_counter() - start))
+
+    bench('ORDER BY random()', order_by_random, draws, count)
+    bench('draw_sql()', draw_sql, draws * 10, count)
+    bench('QuestionSampler.draw()', sampler.draw, draws * 10000, count)
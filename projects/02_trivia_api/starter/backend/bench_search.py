@@ -0,0 +1,116 @@
+'''
+Question search benchmark.
+
+Fills a SQLite database with synthetic questions (1M by default) made of
+words from a Zipf-distributed vocabulary, then times searches for words,
+word fragments and phrases taken from random questions with:
+    LIKE '%term%'            the table scan of search_sql() on SQLite
+    QuestionIndex.search()   the in-process trigram index
+and fuzzy searches for the same phrases with one letter dropped.
+
+Terms are taken from questions, so the commonest words of the vocabulary
+show up often; such terms match a large part of all questions. Searches
+ask for the first page of ten, which the index stops at; LIKE counts all
+matches.
+
+    python bench_search.py [questions] [searches]
+'''
+import os
+import random
+import sys
+import time
+from itertools import accumulate
+from flask import Flask
+
+from models import setup_db, db, Question
+from flaskr.search import QuestionIndex, MIN_TERM_LENGTH, search_sql
+
+DATABASE = '/tmp/trivia_search_bench.db'
+VOCABULARY = 20000
+BATCH_SIZE = 50000
+SYLLABLES = [consonant + vowel for consonant in 'bcdfghklmnprstvw' for vowel in 'aeiou'] + \
+  ['an', 'er', 'in', 'on', 'st', 'th', 'ing', 'tion']
+OPENINGS = ['What is the', 'Which', 'Who was the', 'In which year did the', 'How many']
+
+
+def vocabulary(rng):
+  words = set()
+  while len(words) < VOCABULARY:
+    words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+  return sorted(words)
+
+
+def fill(count, rng):
+  words = vocabulary(rng)
+  cum_weights = list(accumulate(1.0 / rank for rank in range(1, len(words) + 1)))
+  rows = []
+  for i in range(count):
+    question = ' '.join([rng.choice(OPENINGS)] + rng.choices(words, cum_weights=cum_weights,
+                                                             k=rng.randint(4, 8)))
+    rows.append({'question': question + '?', 'answer': 'Answer %d' % i, 'category': 1, 'difficulty': 1})
+    if len(rows) == BATCH_SIZE:
+      db.session.execute(Question.__table__.insert(), rows)
+      rows = []
+  if rows:
+    db.session.execute(Question.__table__.insert(), rows)
+  db.session.commit()
+
+
+def terms(count, searches, rng):
+  # a word, a fragment of a word and a two-word phrase from random questions
+  result = []
+  while len(result) < searches:
+    question = db.session.query(Question.question).filter(Question.id == rng.randint(1, count)).scalar()
+    words = question.rstrip('?').split()[-4:]
+    word = rng.choice(words)
+    result.append(word)
+    if len(word[1:6]) >= MIN_TERM_LENGTH:
+      result.append(word[1:6])
+    result.append(' '.join(words[:2]))
+  return result[:searches]
+
+
+def typo(term, rng):
+  i = rng.randrange(len(term))
+  return term[:i] + term[i + 1:]
+
+
+def bench(name, search, searches):
+  matches = 0
+  timings = []
+  for term in searches:
+    start = time.perf_counter()
+    matches += search(term)
+    timings.append((time.perf_counter() - start) * 1000)
+  timings.sort()
+  print('%-30s median %8.3f ms, p95 %8.3f ms, max %8.3f ms, %d matches on average' % (
+    name, timings[len(timings) // 2], timings[int(len(timings) * 0.95)], timings[-1],
+    matches // len(searches)))
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+  searches = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+
+  if os.path.exists(DATABASE):
+    os.remove(DATABASE)
+  app = Flask(__name__)
+  setup_db(app, 'sqlite:///' + DATABASE)
+  rng = random.Random(0)
+
+  with app.app_context():
+    start = time.perf_counter()
+    fill(count, rng)
+    print('inserted %d questions in %.1f s' % (count, time.perf_counter() - start))
+
+    index = QuestionIndex()
+    start = time.perf_counter()
+    index.load()
+    print('loaded the index in %.1f s' % (time.perf_counter() - start))
+
+    # distinct terms, so no search is answered by the result cache
+    sample = list(dict.fromkeys(terms(count, searches, rng)))
+    phrases = [typo(term, rng) for term in sample if ' ' in term]
+    bench("LIKE '%term%'", lambda term: search_sql(term)[1], sample[:max(3, searches // 10)])
+    bench('QuestionIndex.search()', lambda term: index.search(term)[1], sample)
+    bench('QuestionIndex.search(fuzzy)', lambda term: index.search(term, True)[1], phrases)
@@ -4,14 +4,65 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, question_counts, categories_map
+from .sampler import QuestionSampler, draw_sql
+from .quiz_sessions import MemorySessionStore
+from .search import QuestionIndex, MIN_TERM_LENGTH, normalize, search_sql
 
 QUESTIONS_PER_PAGE = 10
+QUIZ_ROUNDS = 5
+QUIZ_MAX_ROUNDS = 50
+
+def get_quiz_category(body):
+  '''
+  Category id of a quiz request, None for all categories
+  '''
+  quiz_category = body.get('quiz_category') or {}
+  if not isinstance(quiz_category, dict):
+    abort(422)
+  try:
+    return int(quiz_category.get('id') or 0) or None
+  except (TypeError, ValueError):
+    abort(422)
 
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
+  if test_config:
+    app.config.from_mapping(test_config)
   setup_db(app)
+  sampler = QuestionSampler()
+  app.question_sampler = sampler
+  question_index = QuestionIndex()
+  app.question_index = question_index
+  # pass a store shared between workers (see quiz_sessions.py) as QUIZ_SESSION_STORE
+  quiz_sessions = app.config.get('QUIZ_SESSION_STORE') or MemorySessionStore()
+
+  def paginate_questions(query):
+    '''
+    Questions of the page requested by ?page or ?after (see GET /questions)
+    and the next_after id, None on the last page
+    '''
+    query = query.order_by(Question.id)
+    after = request.args.get('after', type=int)
+    if after is not None:
+      questions = query.filter(Question.id > after).limit(QUESTIONS_PER_PAGE).all()
+    else:
+      page = request.args.get('page', 1, type=int)
+      if page < 1:
+        abort(404)
+      questions = query.offset((page - 1) * QUESTIONS_PER_PAGE).limit(QUESTIONS_PER_PAGE).all()
+      if not questions and page > 1:
+        abort(404)
+    next_after = questions[-1].id if len(questions) == QUESTIONS_PER_PAGE else None
+    return questions, next_after
+
+  def draw_question_id(category, previous):
+    if sampler.is_stale():
+      sampler.load_in_background(app)
+    if sampler.loaded:
+      return sampler.draw(category, previous)
+    return draw_sql(category, previous)
   
   '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -22,82 +73,275 @@ def create_app(test_config=None):
   '''
 
   '''
-  @TODO: 
-  Create an endpoint to handle GET requests 
-  for all available categories.
+  GET /categories
   '''
-
+  @app.route('/categories')
+  def get_categories():
+    return jsonify({
+      'success': True,
+      'categories': categories_map()
+    })
 
   '''
-  @TODO: 
-  Create an endpoint to handle GET requests for questions, 
-  including pagination (every 10 questions). 
-  This endpoint should return a list of questions, 
-  number of total questions, current category, categories. 
-
-  TEST: At this point, when you start the application
-  you should see questions and categories generated,
-  ten questions per page and pagination at the bottom of the screen for three pages.
-  Clicking on the page numbers should update the questions. 
+  GET /questions
+      ten questions per page with the number of questions and the categories.
+      ?page=N counts pages from 1; ?after=<id> instead returns the questions
+      following that id (keyset mode), and next_after continues the listing,
+      so later pages cost the same as the first.
   '''
+  @app.route('/questions')
+  def get_questions():
+    questions, next_after = paginate_questions(Question.query)
 
-  '''
-  @TODO: 
-  Create an endpoint to DELETE question using a question ID. 
+    return jsonify({
+      'success': True,
+      'questions': [question.format() for question in questions],
+      'total_questions': question_counts.total(),
+      'categories': categories_map(),
+      'current_category': None,
+      'next_after': next_after
+    })
 
-  TEST: When you click the trash icon next to a question, the question will be removed.
-  This removal will persist in the database and when you refresh the page. 
   '''
-
+  DELETE /questions/<question_id>
   '''
-  @TODO: 
-  Create an endpoint to POST a new question, 
-  which will require the question and answer text, 
-  category, and difficulty score.
+  @app.route('/questions/<int:question_id>', methods=['DELETE'])
+  def delete_question(question_id):
+    question = Question.query.get(question_id)
+    if question is None:
+      abort(404)
 
-  TEST: When you submit a question on the "Add" tab, 
-  the form will clear and the question will appear at the end of the last page
-  of the questions list in the "List" tab.  
-  '''
+    try:
+      question.delete()
+    except Exception:
+      db.session.rollback()
+      abort(422)
+    sampler.remove(question_id)
+    question_index.remove(question_id)
 
+    return jsonify({
+      'success': True,
+      'deleted': question_id
+    })
+
+  '''
+  POST /questions
+      creates a question from question, answer, category and difficulty,
+      or searches the questions when the body has a searchTerm (see
+      search_questions)
   '''
-  @TODO: 
-  Create a POST endpoint to get questions based on a search term. 
-  It should return any questions for whom the search term 
-  is a substring of the question. 
+  @app.route('/questions', methods=['POST'])
+  def create_question():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+      abort(400)
+    if 'searchTerm' in body:
+      return search_questions(body)
+
+    question_text = body.get('question')
+    answer = body.get('answer')
+    category = body.get('category')
+    difficulty = body.get('difficulty')
+    if not question_text or not answer or category is None or difficulty is None:
+      abort(422)
+
+    try:
+      question = Question(question_text, answer, int(category), int(difficulty))
+      question.insert()
+    except Exception:
+      db.session.rollback()
+      abort(422)
+    sampler.add(question.id, question.category)
+    question_index.add(question.id, question.question)
+
+    return jsonify({
+      'success': True,
+      'created': question.id
+    })
 
-  TEST: Search by any phrase. The questions list will update to include 
-  only question that include that string within their question. 
-  Try using the word "title" to start. 
   '''
+  search_questions
+      questions whose text contains searchTerm, ignoring case, ten per
+      page (page counts from 1). With fuzzy true, misspelled terms still
+      find questions; how close is close enough depends on the database:
+        PostgreSQL   the whole term against the question's best matching
+                     run of words, at least 0.6 of its trigrams shared
+                     (pg_trgm word similarity); substring matches
+                     first, then by that share
+        otherwise    each word of the term against single words, at least
+                     0.3 similar (pg_trgm similarity); every word of the
+                     term needs a match, ranked by the summed similarity
+      Terms shorter than a trigram (three characters), and fuzzy searches
+      elsewhere than PostgreSQL until the index is loaded, are plain
+      substring matches scanned by the database. In-process searches
+      bound their work (see QuestionIndex), so for terms matching many
+      questions total_questions is an estimate.
+  '''
+  def search_questions(body):
+    term = body.get('searchTerm')
+    page = body.get('page', 1)
+    fuzzy = body.get('fuzzy', False)
+    if not isinstance(term, str) or not isinstance(page, int) or page < 1 \
+        or not isinstance(fuzzy, bool):
+      abort(422)
+    offset = (page - 1) * QUESTIONS_PER_PAGE
+
+    # PostgreSQL has the trigram index itself (see migrations); neither
+    # index has anything to look up for shorter terms
+    if len(normalize(term)) < MIN_TERM_LENGTH:
+      fuzzy = in_process = False
+    else:
+      in_process = db.session.connection().dialect.name != 'postgresql'
+    if in_process and question_index.is_stale():
+      question_index.load_in_background(app)
+    if in_process and question_index.loaded:
+      ids, total = question_index.search(term, fuzzy, offset, QUESTIONS_PER_PAGE)
+    else:
+      ids, total = search_sql(term, fuzzy, offset, QUESTIONS_PER_PAGE)
+    if not ids and page > 1:
+      abort(404)
 
+    questions = dict((question.id, question) for question in Question.query.filter(Question.id.in_(ids)))
+    return jsonify({
+      'success': True,
+      'questions': [questions[question_id].format() for question_id in ids if question_id in questions],
+      'total_questions': total,
+      'current_category': None
+    })
+
+  '''
+  GET /categories/<category_id>/questions
+      the questions of one category, paged like GET /questions
   '''
-  @TODO: 
-  Create a GET endpoint to get questions based on category. 
+  @app.route('/categories/<int:category_id>/questions')
+  def get_category_questions(category_id):
+    categories = categories_map()
+    if str(category_id) not in categories:
+      abort(404)
+    # served by the (category, id) index in both modes
+    questions, next_after = paginate_questions(Question.query.filter(Question.category == category_id))
 
-  TEST: In the "List" tab / main screen, clicking on one of the 
-  categories in the left column will cause only questions of that 
-  category to be shown. 
+    return jsonify({
+      'success': True,
+      'questions': [question.format() for question in questions],
+      'total_questions': question_counts.total(category_id),
+      'current_category': category_id,
+      'next_after': next_after
+    })
+
+  '''
+  POST /quizzes
+      returns a random question of quiz_category (id 0 for all categories)
+      that is not in previous_questions, or null once all were played
   '''
+  @app.route('/quizzes', methods=['POST'])
+  def play_quiz():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+      abort(400)
+
+    previous = body.get('previous_questions') or []
+    if not isinstance(previous, list):
+      abort(422)
+    try:
+      previous = set(int(question_id) for question_id in previous)
+    except (TypeError, ValueError):
+      abort(422)
+    category = get_quiz_category(body)
+
+    # a drawn id may have been deleted by another server process
+    for _ in range(3):
+      question_id = draw_question_id(category, previous)
+      question = Question.query.get(question_id) if question_id is not None else None
+      if question is not None or question_id is None:
+        break
+      sampler.remove(question_id)
 
+    return jsonify({
+      'success': True,
+      'question': question.format() if question else None
+    })
 
   '''
-  @TODO: 
-  Create a POST endpoint to get questions to play the quiz. 
-  This endpoint should take category and previous question parameters 
-  and return a random questions within the given category, 
-  if provided, and that is not one of the previous questions. 
+  POST /quizzes/sessions
+      starts a quiz of quiz_category (id 0 for all categories) with up to
+      rounds questions (5 by default), dealt by POST /quizzes/sessions/<id>/next
+  '''
+  @app.route('/quizzes/sessions', methods=['POST'])
+  def create_quiz_session():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+      abort(400)
+    category = get_quiz_category(body)
+    rounds = body.get('rounds', QUIZ_ROUNDS)
+    if not isinstance(rounds, int) or isinstance(rounds, bool) or rounds < 1:
+      abort(422)
+
+    # the questions are drawn at random, so the deck is already shuffled
+    deck = []
+    drawn = set()
+    for _ in range(min(rounds, QUIZ_MAX_ROUNDS)):
+      question_id = draw_question_id(category, drawn)
+      if question_id is None:
+        break
+      drawn.add(question_id)
+      deck.append(question_id)
 
-  TEST: In the "Play" tab, after a user selects "All" or a category,
-  one question at a time is displayed, the user is allowed to answer
-  and shown whether they were correct or not. 
+    return jsonify({
+      'success': True,
+      'session_id': quiz_sessions.create(deck),
+      'total_questions': len(deck)
+    })
+
+  '''
+  POST /quizzes/sessions/<session_id>/next
+      returns the next question of the session, null once all were dealt
   '''
+  @app.route('/quizzes/sessions/<session_id>/next', methods=['POST'])
+  def next_quiz_question(session_id):
+    question = None
+    while question is None:
+      try:
+        question_id, remaining = quiz_sessions.deal(session_id)
+      except KeyError:
+        abort(404)
+      if question_id is None:
+        break
+      # skips questions deleted since the session started
+      question = Question.query.get(question_id)
+
+    return jsonify({
+      'success': True,
+      'question': question.format() if question else None,
+      'remaining': remaining
+    })
 
   '''
-  @TODO: 
-  Create error handlers for all expected errors 
-  including 404 and 422. 
+  Error handlers
   '''
+  @app.errorhandler(400)
+  def bad_request(error):
+    return jsonify({
+      'success': False,
+      'error': 400,
+      'message': 'bad request'
+    }), 400
+
+  @app.errorhandler(404)
+  def not_found(error):
+    return jsonify({
+      'success': False,
+      'error': 404,
+      'message': 'resource not found'
+    }), 404
+
+  @app.errorhandler(422)
+  def unprocessable(error):
+    return jsonify({
+      'success': False,
+      'error': 422,
+      'message': 'unprocessable'
+    }), 422
   
   return app
 
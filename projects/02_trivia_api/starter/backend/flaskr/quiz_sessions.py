@@ -0,0 +1,69 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+QUIZ_SESSION_TTL = 60 * 60
+QUIZ_MAX_SESSIONS = 10000
+
+'''
+Quiz session stores
+    where quiz sessions live between rounds. A session is a deck of
+    question ids, already shuffled, that is dealt one id per round. Any
+    object with these two methods can serve as a store:
+
+    create(deck) returns a new session id.
+    deal(session_id) returns (question_id, remaining), question_id being
+    None once the deck is empty, and raises KeyError for an unknown or
+    expired session.
+
+    MemorySessionStore keeps sessions in the process, so it only works
+    with a single worker or sticky sessions. Deployments with several
+    workers pass a store shared between them to create_app as
+    QUIZ_SESSION_STORE.
+'''
+
+
+'''
+MemorySessionStore
+    at most max_sessions sessions, each expiring ttl seconds after it was
+    last used; the least recently used one is evicted first.
+'''
+class MemorySessionStore:
+
+  def __init__(self, max_sessions=QUIZ_MAX_SESSIONS, ttl=QUIZ_SESSION_TTL, clock=time.monotonic):
+    self.max_sessions = max_sessions
+    self.ttl = ttl
+    self.clock = clock
+    self._sessions = OrderedDict()
+    self._lock = threading.Lock()
+
+  def _evict_expired(self, now):
+    # sessions are in order of last use, so the expired ones come first
+    while self._sessions:
+      session_id, (expires, _) = next(iter(self._sessions.items()))
+      if expires > now:
+        break
+      del self._sessions[session_id]
+
+  def create(self, deck):
+    session_id = secrets.token_urlsafe(16)
+    now = self.clock()
+    with self._lock:
+      self._evict_expired(now)
+      # dealt from the end
+      self._sessions[session_id] = (now + self.ttl, list(reversed(deck)))
+      while len(self._sessions) > self.max_sessions:
+        self._sessions.popitem(last=False)
+    return session_id
+
+  def deal(self, session_id):
+    now = self.clock()
+    with self._lock:
+      self._evict_expired(now)
+      expires, deck = self._sessions[session_id]
+      self._sessions[session_id] = (now + self.ttl, deck)
+      self._sessions.move_to_end(session_id)
+      question_id = deck.pop() if deck else None
+      return question_id, len(deck)
+
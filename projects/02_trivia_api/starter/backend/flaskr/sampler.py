@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from array import array
+
+from models import db, Question
+
+# Reload the id arrays after this many seconds, so questions added or
+# removed by other server processes are picked up.
+SAMPLER_RELOAD_SECONDS = 300
+ALL_CATEGORIES = None
+
+'''
+QuestionSampler
+    draws a random question id of a category (or of all categories)
+    that is not one of the previous questions.
+
+    Ids are kept in one array per category plus one for every question.
+    A draw picks random slots until it finds an id that was neither
+    removed nor played before, so it takes constant expected time as
+    long as at least half of the ids are still candidates. When more
+    than half were already played, the remaining candidates are fewer
+    than the previous questions sent with the request and are listed
+    directly.
+
+    Deleted ids are only marked as removed, and an array is compacted
+    once half of it is removed.
+
+    Until the arrays are loaded, draws go through draw_sql() and the
+    first one starts loading them in the background.
+'''
+class QuestionSampler:
+
+  def __init__(self, reload_seconds=SAMPLER_RELOAD_SECONDS, rng=None):
+    self.reload_seconds = reload_seconds
+    self.rng = rng or random.Random()
+    self._ids = None
+    self._removed = set()
+    self._loaded_at = None
+    self._loading = False
+    self._lock = threading.Lock()
+
+  @property
+  def loaded(self):
+    return self._ids is not None
+
+  def load(self):
+    '''
+    Reads every question id. Must run inside an application context.
+    '''
+    ids = {ALL_CATEGORIES: array('l')}
+    for question_id, category in db.session.query(Question.id, Question.category).yield_per(10000):
+      ids[ALL_CATEGORIES].append(question_id)
+      ids.setdefault(category, array('l')).append(question_id)
+    with self._lock:
+      self._ids = ids
+      self._removed = set()
+      self._loaded_at = time.monotonic()
+      self._loading = False
+
+  def load_in_background(self, app):
+    with self._lock:
+      if self._loading:
+        return
+      self._loading = True
+
+    def run():
+      try:
+        with app.app_context():
+          self.load()
+      finally:
+        self._loading = False
+
+    threading.Thread(target=run, name='question-sampler-load', daemon=True).start()
+
+  def is_stale(self):
+    return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_seconds
+
+  def add(self, question_id, category):
+    with self._lock:
+      if self._ids is None:
+        return
+      self._removed.discard(question_id)
+      self._ids[ALL_CATEGORIES].append(question_id)
+      self._ids.setdefault(category, array('l')).append(question_id)
+
+  def remove(self, question_id):
+    with self._lock:
+      if self._ids is None:
+        return
+      self._removed.add(question_id)
+      if len(self._removed) * 2 > len(self._ids[ALL_CATEGORIES]):
+        self._compact()
+
+  def _compact(self):
+    removed = self._removed
+    self._ids = {category: array('l', (i for i in ids if i not in removed))
+                 for category, ids in self._ids.items()}
+    self._removed = set()
+
+  def draw(self, category=ALL_CATEGORIES, previous=()):
+    '''
+    Returns a random question id of category that is not in previous, or
+    None when every question was played. previous must be a set.
+    '''
+    with self._lock:
+      ids = self._ids.get(category)
+      removed = self._removed
+      if not ids:
+        return None
+
+      if (len(previous) + len(removed)) * 2 <= len(ids):
+        # at least half of the slots are candidates: about two tries on average
+        while True:
+          question_id = ids[self.rng.randrange(len(ids))]
+          if question_id not in previous and question_id not in removed:
+            return question_id
+
+      candidates = [i for i in ids if i not in previous and i not in removed]
+      return self.rng.choice(candidates) if candidates else None
+
+
+def draw_sql(category=ALL_CATEGORIES, previous=(), rng=random):
+  '''
+  Random question id through the (category, id) index: picks a random
+  point in the category's id range and takes the first id after it that
+  was not played, wrapping around. Ids after a gap are slightly more
+  likely, which is acceptable until the sampler is loaded.
+  '''
+  query = db.session.query(Question.id)
+  if category is not None:
+    query = query.filter(Question.category == category)
+  if previous:
+    query = query.filter(~Question.id.in_(previous))
+
+  # two index lookups; a single min()/max() query scans the whole range on SQLite
+  low = query.order_by(Question.id).limit(1).scalar()
+  if low is None:
+    return None
+  high = query.order_by(Question.id.desc()).limit(1).scalar()
+  pivot = rng.randint(low, high)
+  return query.filter(Question.id >= pivot).order_by(Question.id).limit(1).scalar() \
+    or query.filter(Question.id < pivot).order_by(Question.id.desc()).limit(1).scalar()
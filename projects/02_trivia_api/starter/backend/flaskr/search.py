@@ -0,0 +1,313 @@
+import re
+import threading
+import time
+from array import array
+from bisect import insort
+from collections import Counter, OrderedDict
+
+from sqlalchemy import text
+from models import db, Question
+
+# Reload the index after this many seconds, so questions added or removed
+# by other server processes are picked up.
+SEARCH_RELOAD_SECONDS = 300
+# Trigram similarity a word needs to stand in for a misspelled one, the
+# default pg_trgm.similarity_threshold
+WORD_SIMILARITY = 0.3
+# Share of the search term's trigrams a question needs on PostgreSQL, the
+# default pg_trgm.word_similarity_threshold
+FUZZY_THRESHOLD = 0.6
+# Shorter terms have no trigram to look up, in the index or on PostgreSQL
+MIN_TERM_LENGTH = 3
+# Most candidates a substring search checks between looks at how many matched
+SCAN_CHUNK = 1024
+# Questions ranked by a fuzzy search at most, see _search_fuzzy()
+FUZZY_CANDIDATES = 500
+# Results of recent searches kept, until the next change to the questions
+RESULT_CACHE_SIZE = 256
+
+_EMPTY = array('i')
+_words = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(value):
+  return ' '.join(value.casefold().split())
+
+
+def trigrams(value):
+  return set(value[i:i + 3] for i in range(len(value) - 2))
+
+
+'''
+QuestionIndex
+    in-process trigram index of the question texts, used where the
+    database has no trigram index (SQLite in development and tests).
+
+    Texts are lowercased, padded with a space on each side and split into
+    trigrams, each listing the ids of the questions containing it in id
+    order. A substring search walks the list of the term's rarest trigram
+    and checks each question for the term itself, until a page is full.
+
+    Fuzzy searches work on words: every word of the term is replaced by
+    the known words at least word_similarity similar to it, found through
+    a second, much smaller trigram index over the vocabulary. Questions
+    must contain a replacement of each word, and rank by how similar
+    their replacements are. Only the FUZZY_CANDIDATES questions with the
+    closest replacements of the term's rarest word are ranked: when that
+    word is common, total is an estimate and weaker matches can be missed.
+
+    Until the index is loaded, searches go through search_sql() and the
+    first one starts loading it in the background.
+'''
+class QuestionIndex:
+
+  def __init__(self, reload_seconds=SEARCH_RELOAD_SECONDS, word_similarity=WORD_SIMILARITY):
+    self.reload_seconds = reload_seconds
+    self.word_similarity = word_similarity
+    self._texts = None
+    self._postings = None
+    self._words = None
+    self._vocabulary = None
+    self._results = OrderedDict()
+    self._loaded_at = None
+    self._loading = False
+    # bumped by every change, so searches started before it are not cached
+    self._version = 0
+    self._lock = threading.Lock()
+
+  @property
+  def loaded(self):
+    return self._texts is not None
+
+  def load(self):
+    '''
+    Reads every question. Must run inside an application context.
+    '''
+    texts = {}
+    postings = {}
+    words = {}
+    query = db.session.query(Question.id, Question.question).order_by(Question.id)
+    for question_id, question in query.yield_per(10000):
+      padded = ' %s ' % normalize(question or '')
+      texts[question_id] = padded
+      for gram in trigrams(padded):
+        ids = postings.get(gram)
+        if ids is None:
+          ids = postings[gram] = array('i')
+        ids.append(question_id)
+      for word in set(_words.findall(padded)):
+        ids = words.get(word)
+        if ids is None:
+          ids = words[word] = array('i')
+        ids.append(question_id)
+    vocabulary = {}
+    for word in words:
+      _add_word(vocabulary, word)
+    with self._lock:
+      self._texts = texts
+      self._postings = postings
+      self._words = words
+      self._vocabulary = vocabulary
+      self._results.clear()
+      self._version += 1
+      self._loaded_at = time.monotonic()
+      self._loading = False
+
+  def load_in_background(self, app):
+    with self._lock:
+      if self._loading:
+        return
+      self._loading = True
+
+    def run():
+      try:
+        with app.app_context():
+          self.load()
+      finally:
+        self._loading = False
+
+    threading.Thread(target=run, name='question-index-load', daemon=True).start()
+
+  def is_stale(self):
+    return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_seconds
+
+  def add(self, question_id, question):
+    with self._lock:
+      # None before the first load; present when a load already read it
+      if self._texts is None or question_id in self._texts:
+        return
+      padded = ' %s ' % normalize(question or '')
+      self._texts[question_id] = padded
+      self._results.clear()
+      self._version += 1
+      for gram in trigrams(padded):
+        _add_id(self._postings.setdefault(gram, array('i')), question_id)
+      for word in set(_words.findall(padded)):
+        if word not in self._words:
+          self._words[word] = array('i')
+          _add_word(self._vocabulary, word)
+        self._words[word].append(question_id)
+
+  def remove(self, question_id):
+    # its ids stay in the trigram lists until the next load; searches skip them
+    with self._lock:
+      if self._texts is not None:
+        self._texts.pop(question_id, None)
+        self._results.clear()
+        self._version += 1
+
+  def search(self, term, fuzzy=False, offset=0, limit=10):
+    '''
+    Returns (ids, total) of one page of the questions matching term, best
+    first: by id for substring matches, by how similar their words are for
+    fuzzy ones. term must have at least MIN_TERM_LENGTH characters.
+
+    Substring searches stop once the page is full, so for terms matching
+    more questions than that, total is estimated from the share of the
+    candidates checked so far that matched.
+    '''
+    term = normalize(term)
+    if len(term) < MIN_TERM_LENGTH:
+      return [], 0
+    key = (term, fuzzy, offset, limit)
+    with self._lock:
+      result = self._results.get(key)
+      if result is not None:
+        self._results.move_to_end(key)
+        return result
+      snapshot = (self._texts, self._postings, self._words, self._vocabulary)
+      version = self._version
+
+    # concurrent add() calls only insert into the dicts and lists, which
+    # lookups and walks by index tolerate
+    result = self._search(snapshot, term, fuzzy, offset, limit)
+    with self._lock:
+      if self._version == version:
+        self._results[key] = result
+        while len(self._results) > RESULT_CACHE_SIZE:
+          self._results.popitem(last=False)
+    return result
+
+  def _search(self, snapshot, term, fuzzy, offset, limit):
+    texts, postings, words, vocabulary = snapshot
+    if fuzzy:
+      return self._search_fuzzy(term, texts, words, vocabulary, offset, limit)
+
+    # the rarest trigram's list holds every match, in id order; check it a
+    # slice at a time, doubling up to SCAN_CHUNK, until the page is full
+    candidates = min((postings.get(gram, _EMPTY) for gram in trigrams(term)), key=len)
+    wanted = offset + limit
+    get = texts.get
+    matches = []
+    checked = 0
+    size = wanted
+    while checked < len(candidates) and len(matches) < wanted:
+      chunk = candidates[checked:checked + size]
+      checked += len(chunk)
+      size = min(2 * size, SCAN_CHUNK)
+      matches.extend([question_id for question_id in chunk if term in get(question_id, '')])
+    total = len(matches)
+    if checked < len(candidates):
+      total = max(total + 1, round(total * len(candidates) / checked))
+    return matches[offset:wanted], total
+
+  def _similar_words(self, word, words, vocabulary):
+    # {known word: similarity} of the words at least word_similarity similar;
+    # a padded word has about as many trigrams as it has characters
+    grams = trigrams(' %s ' % word)
+    shared = Counter()
+    for gram in grams:
+      shared.update(vocabulary.get(gram, ()))
+    similar = {}
+    for other, count in shared.items():
+      similarity = count / (len(grams) + len(other) - count)
+      if similarity >= self.word_similarity:
+        similar[other] = similarity
+    if word in words:
+      similar[word] = 1.0
+    return similar
+
+  def _search_fuzzy(self, term, texts, words, vocabulary, offset, limit):
+    replacements = [self._similar_words(word, words, vocabulary) for word in set(_words.findall(term))]
+    if not replacements or not all(replacements):
+      return [], 0
+
+    # candidates are the questions with a replacement of the word with the
+    # fewest questions, closest replacements first; the other words are
+    # looked up among each candidate's own words
+    replacements.sort(key=lambda similar: sum(len(words[word]) for word in similar))
+    first, rest = replacements[0], replacements[1:]
+    pool = sum(len(words[word]) for word in first)
+    candidates = {}
+    walked = 0
+    for word, similarity in sorted(first.items(), key=lambda item: -item[1]):
+      for question_id in words[word]:
+        if len(candidates) >= FUZZY_CANDIDATES:
+          break
+        walked += 1
+        candidates.setdefault(question_id, similarity)
+      else:
+        continue
+      break
+
+    ranked = []
+    for question_id, score in candidates.items():
+      text = texts.get(question_id)
+      if text is None:
+        continue
+      question_words = set(_words.findall(text))
+      for similar in rest:
+        best = max([similar.get(word, 0) for word in question_words], default=0)
+        if not best:
+          break
+        score += best
+      else:
+        ranked.append((-score, question_id))
+    ranked.sort()
+
+    total = len(ranked)
+    if walked < pool:
+      total = max(total, round(total * pool / walked))
+    return [question_id for _, question_id in ranked[offset:offset + limit]], total
+
+
+def _add_id(ids, question_id):
+  # keeps the list in id order when creates commit out of order
+  if ids and ids[-1] > question_id:
+    insort(ids, question_id)
+  else:
+    ids.append(question_id)
+
+
+def _add_word(vocabulary, word):
+  # vocabulary maps the trigrams of padded words to the words
+  for gram in trigrams(' %s ' % word):
+    vocabulary.setdefault(gram, []).append(word)
+
+
+def _like_pattern(term):
+  return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def search_sql(term, fuzzy=False, offset=0, limit=10):
+  '''
+  Returns (ids, total) of one page of matches. On PostgreSQL the
+  ix_questions_question_trgm index (see migrations) serves ILIKE for terms
+  of at least three characters and the <% word similarity operator of
+  fuzzy matches; elsewhere substring matches scan the table.
+  '''
+  if fuzzy and db.session.connection().dialect.name == 'postgresql':
+    db.session.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                       {'threshold': str(FUZZY_THRESHOLD)})
+    rows = db.session.execute(text('''
+      SELECT id, count(*) OVER () AS total
+      FROM questions
+      WHERE :term <% question
+      ORDER BY question ILIKE :pattern DESC, word_similarity(:term, question) DESC, id
+      OFFSET :offset LIMIT :limit
+    '''), {'term': term, 'pattern': _like_pattern(term), 'offset': offset, 'limit': limit}).fetchall()
+  else:
+    rows = db.session.query(Question.id, db.func.count().over()) \
+      .filter(Question.question.ilike(_like_pattern(term), escape='\\')) \
+      .order_by(Question.id).offset(offset).limit(limit).all()
+  return [row[0] for row in rows], (rows[0][1] if rows else 0)
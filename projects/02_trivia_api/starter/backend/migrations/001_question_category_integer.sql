@@ -0,0 +1,39 @@
+-- Makes questions.category an integer foreign key to categories.id with a
+-- (category, id) index, as in trivia.psql. Databases restored from
+-- trivia.psql already match; databases whose tables were created by
+-- db.create_all() from the old model hold the category id as text.
+--
+--   psql trivia < migrations/001_question_category_integer.sql
+--
+-- Safe to run more than once.
+
+BEGIN;
+
+DO $$
+BEGIN
+  IF (SELECT data_type FROM information_schema.columns
+      WHERE table_schema = current_schema() AND table_name = 'questions'
+        AND column_name = 'category') <> 'integer' THEN
+    UPDATE questions SET category = NULL WHERE category !~ '^\s*[0-9]+\s*$';
+    ALTER TABLE questions ALTER COLUMN category TYPE integer USING trim(category)::integer;
+  END IF;
+END $$;
+
+-- ids of categories that no longer exist, as ON DELETE SET NULL would leave them
+UPDATE questions SET category = NULL
+WHERE category IS NOT NULL AND category NOT IN (SELECT id FROM categories);
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                 WHERE conrelid = 'questions'::regclass AND contype = 'f') THEN
+    ALTER TABLE questions ADD CONSTRAINT category FOREIGN KEY (category)
+      REFERENCES categories(id) ON UPDATE CASCADE ON DELETE SET NULL;
+  END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_questions_category_id ON questions USING btree (category, id);
+
+COMMIT;
+
+ANALYZE questions;
@@ -0,0 +1,11 @@
+-- Trigram index behind the question search: ILIKE '%term%' substring
+-- matches and the <% word similarity operator of fuzzy matches.
+--
+--   psql trivia < migrations/002_question_search_index.sql
+--
+-- Safe to run more than once. Creating the extension needs a role allowed
+-- to do so (pg_trgm is a trusted extension from PostgreSQL 13).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_questions_question_trgm ON questions USING gin (question gin_trgm_ops);
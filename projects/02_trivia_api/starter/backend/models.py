@@ -1,5 +1,7 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+import threading
+import time
+from sqlalchemy import Column, String, Integer, Index, ForeignKey, create_engine, func
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -19,17 +21,80 @@ def setup_db(app, database_path=database_path):
     db.init_app(app)
     db.create_all()
 
+'''
+QuestionCounts
+    number of questions per category, kept up to date by Question.insert
+    and Question.delete so listings need no COUNT(*). Counts are read
+    again after reload_seconds to pick up other server processes' writes.
+
+    A load running between a write's commit and its change() may already
+    count the write, or not; writers pass the version() taken before
+    committing, and a change made stale by a load forces another load
+    instead of being applied.
+'''
+class QuestionCounts:
+
+  def __init__(self, reload_seconds=60):
+    self.reload_seconds = reload_seconds
+    self._counts = None
+    self._loaded_at = None
+    self._version = 0
+    self._lock = threading.Lock()
+
+  def _load(self):
+    self._version += 1
+    counts = dict(db.session.query(Question.category, func.count()).group_by(Question.category))
+    self._counts = counts
+    self._loaded_at = time.monotonic()
+
+  def _current(self):
+    if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_seconds:
+      self._load()
+    return self._counts
+
+  def total(self, category=None):
+    with self._lock:
+      counts = self._current()
+      if category is None:
+        return sum(counts.values())
+      return counts.get(category, 0)
+
+  def version(self):
+    with self._lock:
+      return self._version
+
+  def change(self, category, delta, version):
+    with self._lock:
+      if self._counts is None:
+        return
+      if version != self._version:
+        self._loaded_at = None
+      else:
+        self._counts[category] = max(0, self._counts.get(category, 0) + delta)
+
+  def clear(self):
+    with self._lock:
+      self._version += 1
+      self._counts = None
+      self._loaded_at = None
+
+question_counts = QuestionCounts()
+
 '''
 Question
 
 '''
 class Question(db.Model):  
   __tablename__ = 'questions'
+  __table_args__ = (
+    # quiz draws and category listings range over the ids of one category
+    Index('ix_questions_category_id', 'category', 'id'),
+  )
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'))
   difficulty = Column(Integer)
 
   def __init__(self, question, answer, category, difficulty):
@@ -39,15 +104,19 @@ class Question(db.Model):
     self.difficulty = difficulty
 
   def insert(self):
+    version = question_counts.version()
     db.session.add(self)
     db.session.commit()
+    question_counts.change(self.category, 1, version)
   
   def update(self):
     db.session.commit()
 
   def delete(self):
+    version = question_counts.version()
     db.session.delete(self)
     db.session.commit()
+    question_counts.change(self.category, -1, version)
 
   def format(self):
     return {
@@ -75,4 +144,20 @@ class Category(db.Model):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+'''
+categories_map()
+    {id: type} of every category. Categories are only changed through the
+    database, so the map is cached for CATEGORIES_CACHE_SECONDS.
+'''
+CATEGORIES_CACHE_SECONDS = 300
+_categories = {'map': None, 'loaded_at': None}
+
+def categories_map():
+  loaded_at = _categories['loaded_at']
+  if loaded_at is None or time.monotonic() - loaded_at >= CATEGORIES_CACHE_SECONDS:
+    _categories['map'] = dict((str(category.id), category.type)
+                              for category in Category.query.order_by(Category.id))
+    _categories['loaded_at'] = time.monotonic()
+  return _categories['map']
@@ -2,9 +2,11 @@ import os
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, question_counts
+from flaskr.quiz_sessions import MemorySessionStore
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -34,6 +36,280 @@ class TriviaTestCase(unittest.TestCase):
     Write at least one test for each test for successful operation and for expected errors.
     """
 
+    def test_get_categories(self):
+        res = self.client().get('/categories')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['categories'])
+
+    def test_get_paginated_questions(self):
+        res = self.client().get('/questions?page=1')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['categories'])
+        self.assertLessEqual(len(data['questions']), 10)
+        with self.app.app_context():
+            self.assertEqual(data['total_questions'], Question.query.count())
+
+    def test_get_questions_after_id(self):
+        first = json.loads(self.client().get('/questions?page=1').data)
+        second = json.loads(self.client().get('/questions?page=2').data)
+        res = self.client().get('/questions?after=%d' % first['next_after'])
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['questions'], second['questions'])
+
+    def test_404_get_questions_beyond_last_page(self):
+        res = self.client().get('/questions?page=1000')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_search_questions(self):
+        with self.app.app_context():
+            question = Question('Which searchable planet is red?', 'Mars', 1, 1)
+            question.insert()
+        res = self.client().post('/questions', json={'searchTerm': 'SEARCHABLE planet'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([q['id'] for q in data['questions']], [question.id])
+        self.assertEqual(data['total_questions'], 1)
+        self.client().delete('/questions/%d' % question.id)
+
+    def test_search_questions_with_loaded_index(self):
+        index = self.app.question_index
+        with self.app.app_context():
+            question = Question('Which indexed planet is red?', 'Mars', 1, 1)
+            question.insert()
+            index.load()
+
+        res = self.client().post('/questions', json={'searchTerm': 'indexed pla'})
+        self.assertEqual([q['id'] for q in json.loads(res.data)['questions']], [question.id])
+
+        res = self.client().post('/questions', json={'searchTerm': 'indexd planit', 'fuzzy': True})
+        self.assertEqual(json.loads(res.data)['questions'][0]['id'], question.id)
+
+        self.client().delete('/questions/%d' % question.id)
+        self.assertEqual(index.search('indexed pla'), ([], 0))
+
+    def test_search_questions_with_short_term(self):
+        index = self.app.question_index
+        with self.app.app_context():
+            question = Question('Which planet has the XQ storm?', 'Jupiter', 1, 1)
+            question.insert()
+            index.load()
+
+        for body in ({'searchTerm': 'xq'}, {'searchTerm': 'xq', 'fuzzy': True}):
+            res = self.client().post('/questions', json=body)
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual([q['id'] for q in data['questions']], [question.id])
+            self.assertEqual(data['total_questions'], 1)
+        self.client().delete('/questions/%d' % question.id)
+
+    def test_422_search_questions_with_invalid_page(self):
+        res = self.client().post('/questions', json={'searchTerm': 'title', 'page': 0})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+    def test_get_category_questions(self):
+        res = self.client().get('/categories/1/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['current_category'], 1)
+        self.assertTrue(data['questions'])
+        self.assertTrue(all(question['category'] == 1 for question in data['questions']))
+        with self.app.app_context():
+            self.assertEqual(data['total_questions'], Question.query.filter(Question.category == 1).count())
+
+    def test_404_get_questions_of_missing_category(self):
+        res = self.client().get('/categories/1000/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_category_questions_use_the_category_index(self):
+        with self.app.app_context():
+            connection = db.session.connection()
+            query = 'SELECT id FROM questions WHERE category = 1 AND id > 0 ORDER BY id LIMIT 10'
+            if connection.dialect.name == 'postgresql':
+                # the test tables are small enough for a sequential scan to look cheaper
+                connection.execute(text('SET LOCAL enable_seqscan = off'))
+                plan = [row[0] for row in connection.execute(text('EXPLAIN ' + query))]
+            else:
+                plan = [row[-1] for row in connection.execute(text('EXPLAIN QUERY PLAN ' + query))]
+            db.session.rollback()
+
+        self.assertIn('ix_questions_category_id', '\n'.join(plan))
+        self.assertNotIn('Seq Scan', '\n'.join(plan))
+
+    def test_question_counts_follow_inserts_and_deletes(self):
+        with self.app.app_context():
+            total = question_counts.total()
+            in_category = question_counts.total(1)
+            question = Question('Counted?', 'Yes', 1, 1)
+            question.insert()
+            self.assertEqual(question_counts.total(), total + 1)
+            self.assertEqual(question_counts.total(1), in_category + 1)
+            question.delete()
+            self.assertEqual(question_counts.total(), total)
+
+    def test_question_counts_skip_changes_a_load_has_seen(self):
+        with self.app.app_context():
+            version = question_counts.version()
+            question = Question('Counted once?', 'Yes', 1, 1)
+            db.session.add(question)
+            db.session.commit()
+            # a load between the commit and the change already counts it
+            question_counts.clear()
+            total = question_counts.total()
+            question_counts.change(1, 1, version)
+            self.assertEqual(question_counts.total(), total)
+            question.delete()
+            self.assertEqual(question_counts.total(), total - 1)
+
+    def test_create_question(self):
+        res = self.client().post('/questions', json={
+            'question': 'Which planet is closest to the sun?',
+            'answer': 'Mercury',
+            'category': 1,
+            'difficulty': 2
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        with self.app.app_context():
+            self.assertIsNotNone(Question.query.get(data['created']))
+
+    def test_422_create_question_without_answer(self):
+        res = self.client().post('/questions', json={'question': 'Who?', 'category': 1, 'difficulty': 1})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+    def test_delete_question(self):
+        with self.app.app_context():
+            question = Question('To be deleted?', 'Yes', 1, 1)
+            question.insert()
+            question_id = question.id
+
+        res = self.client().delete('/questions/{}'.format(question_id))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['deleted'], question_id)
+        with self.app.app_context():
+            self.assertIsNone(Question.query.get(question_id))
+
+    def test_404_delete_missing_question(self):
+        res = self.client().delete('/questions/1000000')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_play_quiz_in_category(self):
+        res = self.client().post('/quizzes', json={
+            'previous_questions': [],
+            'quiz_category': {'type': 'Science', 'id': '1'}
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(str(data['question']['category']), '1')
+
+    def test_play_quiz_never_repeats_a_question(self):
+        previous = []
+        while True:
+            res = self.client().post('/quizzes', json={
+                'previous_questions': previous,
+                'quiz_category': {'type': 'click', 'id': 0}
+            })
+            question = json.loads(res.data)['question']
+            if question is None:
+                break
+            self.assertNotIn(question['id'], previous)
+            previous.append(question['id'])
+
+        with self.app.app_context():
+            self.assertEqual(len(previous), Question.query.count())
+
+    def test_play_quiz_with_loaded_sampler(self):
+        sampler = self.app.question_sampler
+        with self.app.app_context():
+            sampler.load()
+            ids = [question.id for question in Question.query.filter(Question.category == 1)]
+
+        previous = set(ids[1:])
+        self.assertEqual(sampler.draw(1, previous), ids[0])
+        self.assertIsNone(sampler.draw(1, set(ids)))
+
+    def test_422_play_quiz_with_invalid_previous_questions(self):
+        res = self.client().post('/quizzes', json={
+            'previous_questions': 'none',
+            'quiz_category': {'type': 'Science', 'id': 1}
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+
+    def test_play_quiz_session(self):
+        res = self.client().post('/quizzes/sessions', json={
+            'quiz_category': {'type': 'Science', 'id': 1},
+            'rounds': 3
+        })
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['session_id'])
+        self.assertEqual(data['total_questions'], 3)
+
+        seen = []
+        for remaining in (2, 1, 0):
+            res = self.client().post('/quizzes/sessions/%s/next' % data['session_id'])
+            next_data = json.loads(res.data)
+            self.assertEqual(next_data['remaining'], remaining)
+            self.assertEqual(next_data['question']['category'], 1)
+            self.assertNotIn(next_data['question']['id'], seen)
+            seen.append(next_data['question']['id'])
+
+        res = self.client().post('/quizzes/sessions/%s/next' % data['session_id'])
+        self.assertIsNone(json.loads(res.data)['question'])
+
+    def test_404_next_question_of_unknown_quiz_session(self):
+        res = self.client().post('/quizzes/sessions/unknown/next')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+    def test_quiz_sessions_expire(self):
+        now = [0]
+        store = MemorySessionStore(max_sessions=2, ttl=60, clock=lambda: now[0])
+        first = store.create([1, 2])
+        self.assertEqual(store.deal(first), (1, 1))
+
+        now[0] = 61
+        with self.assertRaises(KeyError):
+            store.deal(first)
+
+        sessions = [store.create([3]) for _ in range(3)]
+        with self.assertRaises(KeyError):
+            store.deal(sessions[0])
+        self.assertEqual(store.deal(sessions[2]), (3, 0))
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -10,6 +10,7 @@ class QuizView extends Component {
     super(props);
     this.state = {
         quizCategory: null,
+        quizSession: null,
         previousQuestions: [],
         showAnswer: false,
         categories: {},
@@ -34,7 +35,26 @@ class QuizView extends Component {
   }
 
   selectCategory = ({type, id=0}) => {
-    this.setState({quizCategory: {type, id}}, this.getNextQuestion)
+    $.ajax({
+      url: '/quizzes/sessions',
+      type: "POST",
+      dataType: 'json',
+      contentType: 'application/json',
+      data: JSON.stringify({
+        quiz_category: {type, id},
+        rounds: questionsPerPlay
+      }),
+      xhrFields: {
+        withCredentials: true
+      },
+      crossDomain: true,
+      success: (result) => {
+        this.setState({quizCategory: {type, id}, quizSession: result.session_id}, this.getNextQuestion)
+      },
+      error: (error) => {
+        alert('Unable to start the quiz. Please try your request again')
+      }
+    })
   }
 
   handleChange = (event) => {
@@ -46,14 +66,10 @@ class QuizView extends Component {
     if(this.state.currentQuestion.id) { previousQuestions.push(this.state.currentQuestion.id) }
 
     $.ajax({
-      url: '/quizzes', //TODO: update request URL
+      url: `/quizzes/sessions/${this.state.quizSession}/next`,
       type: "POST",
       dataType: 'json',
       contentType: 'application/json',
-      data: JSON.stringify({
-        previous_questions: previousQuestions,
-        quiz_category: this.state.quizCategory
-      }),
       xhrFields: {
         withCredentials: true
       },
@@ -86,6 +102,7 @@ class QuizView extends Component {
   restartGame = () => {
     this.setState({
       quizCategory: null,
+      quizSession: null,
       previousQuestions: [],
       showAnswer: false,
       numCorrect: 0,
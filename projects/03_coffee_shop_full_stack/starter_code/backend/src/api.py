@@ -1,10 +1,10 @@
 import os
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db_drop_and_create_all, db_migrate_recipe_to_json, setup_db, Drink, menu_snapshot
 from .auth.auth import AuthError, requires_auth
 
 app = Flask(__name__)
@@ -18,16 +18,39 @@ CORS(app)
 !! Running this function will add one
 '''
 # db_drop_and_create_all()
+db_migrate_recipe_to_json()
 
 # ROUTES
 '''
-@TODO implement endpoint
-    GET /drinks
-        it should be a public endpoint
-        it should contain only the drink.short() data representation
+GET /drinks
+    public endpoint
+    contains only the drink.short() data representation
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
-        or appropriate status code indicating reason for failure
-'''
+    the body is served from the cached menu snapshot, gzipped when the client accepts it,
+    with a strong ETag per encoding; a matching If-None-Match returns 304 Not Modified
+'''
+
+
+@app.route('/drinks')
+def get_drinks():
+    snapshot = menu_snapshot.get()
+    # the gzip and identity bodies are different representations, so each
+    # has its own strong ETag
+    gzipped = bool(request.accept_encodings['gzip'])
+    if gzipped:
+        body, etag = snapshot.gzipped, snapshot.etag + '-gzip'
+    else:
+        body, etag = snapshot.body, snapshot.etag
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 '''
@@ -1,4 +1,8 @@
 import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
@@ -8,6 +12,7 @@ from urllib.request import urlopen
 AUTH0_DOMAIN = 'udacity-fsnd.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'dev'
+TOKEN_CACHE_SIZE = 1024
 
 ## AuthError Exception
 '''
@@ -63,6 +68,58 @@ def check_permissions(permission, payload):
 def verify_decode_jwt(token):
     raise Exception('Not Implemented')
 
+## Verified Token Cache
+'''
+VerifiedTokenCache
+    a bounded LRU cache of tokens that already passed verify_decode_jwt
+    entries are keyed by the SHA-256 digest of the token, hold the decoded
+    payload and its permissions as a set, and expire at the token's exp
+    claim: tokens without a numeric exp are not cached, and an entry is
+    dropped instead of served from its exp on
+'''
+class VerifiedTokenCache:
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry[0]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, token, payload):
+        expires_at = payload.get('exp')
+        if isinstance(expires_at, bool) or not isinstance(expires_at, (int, float)) \
+                or not time.time() < expires_at < float('inf'):
+            return
+        permissions = frozenset(payload.get('permissions') or ())
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload, permissions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = VerifiedTokenCache()
+
+
 '''
 @TODO implement @requires_auth(permission) decorator method
     @INPUTS
@@ -78,8 +135,17 @@ def requires_auth(permission=''):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
+            cached = token_cache.get(token)
+            if cached is not None:
+                payload, permissions = cached[1], cached[2]
+                # fall back to check_permissions so failures raise the usual AuthError
+                if permission not in permissions:
+                    check_permissions(permission, payload)
+                return f(payload, *args, **kwargs)
+
             payload = verify_decode_jwt(token)
             check_permissions(permission, payload)
+            token_cache.put(token, payload)
             return f(payload, *args, **kwargs)
 
         return wrapper
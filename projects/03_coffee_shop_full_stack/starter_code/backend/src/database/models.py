@@ -1,5 +1,11 @@
 import os
-from sqlalchemy import Column, String, Integer
+import gzip
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import Column, String, Integer, JSON, event, inspect
+from sqlalchemy.orm import validates
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -36,11 +42,33 @@ def db_drop_and_create_all():
     # add one demo row which is helping in POSTMAN test
     drink = Drink(
         title='water',
-        recipe='[{"name": "water", "color": "blue", "parts": 1}]'
+        recipe=[{"name": "water", "color": "blue", "parts": 1}]
     )
 
 
     drink.insert()
+
+
+'''
+db_migrate_recipe_to_json()
+    converts the recipe column of an existing database from String(180) to JSON
+    sqlite stores JSON as text, so rows written as JSON strings are read as is
+    and only PostgreSQL needs the column type changed
+    does nothing when the table is missing or the column is already JSON,
+    so it is safe to run on every start
+'''
+
+
+def db_migrate_recipe_to_json():
+    if db.engine.dialect.name != 'postgresql':
+        return
+    inspector = inspect(db.engine)
+    if not inspector.has_table('drink'):
+        return
+    columns = {column['name']: column['type'] for column in inspector.get_columns('drink')}
+    if not isinstance(columns.get('recipe'), JSON):
+        db.session.execute('ALTER TABLE drink ALTER COLUMN recipe TYPE JSON USING recipe::json')
+        db.session.commit()
 # ROUTES
 
 '''
@@ -48,15 +76,50 @@ Drink
 a persistent drink entity, extends the base SQLAlchemy Model
 '''
 
+# the recipe keys of each drink representation
+RECIPE_KEYS = {
+    'short': ('color', 'parts'),
+    'long': ('name', 'color', 'parts'),
+}
+
 
 class Drink(db.Model):
     # Autoincrementing, unique primary key
     id = Column(Integer().with_variant(Integer, "sqlite"), primary_key=True)
     # String Title
     title = Column(String(80), unique=True)
-    # the ingredients blob - this stores a lazy json blob
+    # the ingredients - parsed once when the row is loaded
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
-    recipe = Column(String(180), nullable=False)
+    recipe = Column(JSON, nullable=False)
+
+    '''
+    validate_recipe()
+        accepts the recipe as a list or, as before, as a JSON encoded string
+        and drops the cached recipe forms whenever the recipe changes
+    '''
+
+    @validates('recipe')
+    def validate_recipe(self, key, recipe):
+        if isinstance(recipe, str):
+            recipe = json.loads(recipe)
+        self._recipe_forms = {}
+        return recipe
+
+    '''
+    recipe_form()
+        the recipe projected to the keys of one form ('short' or 'long'),
+        computed once per loaded instance
+    '''
+
+    def recipe_form(self, form):
+        forms = getattr(self, '_recipe_forms', None)
+        if forms is None:
+            forms = self._recipe_forms = {}
+        recipe = forms.get(form)
+        if recipe is None:
+            keys = RECIPE_KEYS[form]
+            recipe = forms[form] = [dict((key, r[key]) for key in keys) for r in self.recipe]
+        return recipe
 
     '''
     short()
@@ -64,12 +127,10 @@ class Drink(db.Model):
     '''
 
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': self.recipe_form('short')
         }
 
     '''
@@ -81,7 +142,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': self.recipe_form('long')
         }
 
     '''
@@ -97,6 +158,7 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        menu_snapshot.invalidate()
 
     '''
     delete()
@@ -110,6 +172,7 @@ class Drink(db.Model):
     def delete(self):
         db.session.delete(self)
         db.session.commit()
+        menu_snapshot.invalidate()
 
     '''
     update()
@@ -123,6 +186,78 @@ class Drink(db.Model):
 
     def update(self):
         db.session.commit()
+        menu_snapshot.invalidate()
 
     def __repr__(self):
         return json.dumps(self.short())
+
+
+'''
+reset_recipe_forms()
+    drops the cached recipe forms when a drink is reloaded or expired,
+    so a recipe changed elsewhere is never served from the cache
+'''
+
+
+@event.listens_for(Drink, 'load')
+@event.listens_for(Drink, 'refresh')
+@event.listens_for(Drink, 'expire')
+def reset_recipe_forms(target, *args):
+    target._recipe_forms = {}
+
+
+'''
+MenuSnapshot
+    the pre-serialized short form menu served by the public GET /drinks
+    it is built on first use and rebuilt after Drink.insert(), update() or
+    delete() commit, so steady state requests touch neither the database
+    nor the JSON encoder
+    writes made by other worker processes are picked up once the snapshot
+    is max_age seconds old; its ETag only changes when the body does
+    each snapshot holds the JSON body, its gzip encoding and a strong ETag
+    derived from the body, so every worker computes the same ETag
+'''
+
+# seconds before a snapshot is rebuilt to see other workers' writes
+MENU_SNAPSHOT_MAX_AGE = int(os.environ.get('MENU_SNAPSHOT_MAX_AGE', 5))
+
+Snapshot = namedtuple('Snapshot', ['version', 'body', 'gzipped', 'etag'])
+
+
+class MenuSnapshot:
+    def __init__(self, max_age=MENU_SNAPSHOT_MAX_AGE, clock=time.monotonic):
+        self.max_age = max_age
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot = None
+        self._built_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def _fresh(self):
+        return self._snapshot is not None and self.clock() - self._built_at < self.max_age
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and self._fresh():
+            return snapshot
+
+        with self._lock:
+            if not self._fresh():
+                drinks = [drink.short() for drink in Drink.query.order_by(Drink.id).all()]
+                body = json.dumps({'success': True, 'drinks': drinks}).encode('utf-8')
+                self._snapshot = Snapshot(
+                    version=self._version,
+                    body=body,
+                    gzipped=gzip.compress(body),
+                    etag=hashlib.sha1(body).hexdigest()
+                )
+                self._built_at = self.clock()
+            return self._snapshot
+
+
+menu_snapshot = MenuSnapshot()
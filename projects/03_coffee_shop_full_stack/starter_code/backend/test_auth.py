@@ -0,0 +1,124 @@
+import time
+import unittest
+from unittest import mock
+from flask import Flask
+
+from src.auth import auth
+from src.auth.auth import AuthError, VerifiedTokenCache, requires_auth
+
+
+def check_permissions(permission, payload):
+    # stands in for the starter's check_permissions TODO
+    if permission not in payload['permissions']:
+        raise AuthError({'code': 'unauthorized', 'description': 'Permission not found.'}, 403)
+    return True
+
+
+def payload(permissions=('get:drinks-detail',), expires_in=60):
+    return {'sub': 'user', 'exp': time.time() + expires_in, 'permissions': list(permissions)}
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def test_get_returns_cached_payload(self):
+        cache = VerifiedTokenCache()
+        cache.put('token', payload())
+
+        expires_at, cached, permissions = cache.get('token')
+        self.assertEqual(cached['sub'], 'user')
+        self.assertIn('get:drinks-detail', permissions)
+        self.assertIsNone(cache.get('other token'))
+
+    def test_entry_expires_at_exp(self):
+        cache = VerifiedTokenCache()
+        cached = payload(expires_in=60)
+        cache.put('token', cached)
+
+        with mock.patch('src.auth.auth.time.time', return_value=cached['exp'] - 1):
+            self.assertIsNotNone(cache.get('token'))
+        with mock.patch('src.auth.auth.time.time', return_value=cached['exp']):
+            self.assertIsNone(cache.get('token'))
+
+    def test_expired_or_exp_less_tokens_are_not_cached(self):
+        cache = VerifiedTokenCache()
+        cache.put('expired', payload(expires_in=-1))
+        cache.put('no exp', {'sub': 'user', 'permissions': []})
+        cache.put('bool exp', {'sub': 'user', 'exp': True, 'permissions': []})
+        cache.put('string exp', {'sub': 'user', 'exp': str(time.time() + 60), 'permissions': []})
+
+        for token in ('expired', 'no exp', 'bool exp', 'string exp'):
+            self.assertIsNone(cache.get(token))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2)
+        cache.put('a', payload())
+        cache.put('b', payload())
+        cache.get('a')
+        cache.put('c', payload())
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+
+class RequiresAuthTestCase(unittest.TestCase):
+    """This class represents the requires_auth decorator test case"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        auth.token_cache.clear()
+        # the header and permission checks are starter TODOs
+        for name, fake in (('get_token_auth_header', mock.Mock(return_value='token')),
+                           ('check_permissions', check_permissions)):
+            patcher = mock.patch('src.auth.auth.' + name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        @requires_auth('get:drinks-detail')
+        def drinks_detail(payload):
+            return payload['sub']
+
+        @requires_auth('delete:drinks')
+        def delete_drink(payload):
+            return payload['sub']
+
+        self.drinks_detail = drinks_detail
+        self.delete_drink = delete_drink
+
+    def tearDown(self):
+        auth.token_cache.clear()
+
+    def call(self, view):
+        with self.app.test_request_context():
+            return view()
+
+    def test_verified_token_is_served_from_cache(self):
+        with mock.patch('src.auth.auth.verify_decode_jwt', return_value=payload()) as verify:
+            self.assertEqual(self.call(self.drinks_detail), 'user')
+            self.assertEqual(self.call(self.drinks_detail), 'user')
+
+        self.assertEqual(verify.call_count, 1)
+
+    def test_403_cached_token_without_permission(self):
+        with mock.patch('src.auth.auth.verify_decode_jwt', return_value=payload()) as verify:
+            self.call(self.drinks_detail)
+            with self.assertRaises(AuthError) as raised:
+                self.call(self.delete_drink)
+
+        self.assertEqual(raised.exception.status_code, 403)
+        self.assertEqual(verify.call_count, 1)
+
+    def test_expired_cached_token_is_verified_again(self):
+        verified = payload(expires_in=60)
+        with mock.patch('src.auth.auth.verify_decode_jwt', return_value=verified) as verify:
+            self.call(self.drinks_detail)
+            with mock.patch('src.auth.auth.time.time', return_value=verified['exp']):
+                self.call(self.drinks_detail)
+
+        self.assertEqual(verify.call_count, 2)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,7 @@ from app.models import db
 from flask_cors import CORS
 from app.models import setup_db
 from app.errors import register_error_handlers
+from app.metrics import init_metrics
 from app.routes.actors import actors_blueprint
 from app.routes.movies import movies_blueprint
 from flask import request
@@ -35,6 +36,9 @@ def create_app(test_config=None):
     
     # Register error handlers
     register_error_handlers(app)
+
+    # Record per-route latency, SQL and auth timings, served at /metrics
+    init_metrics(app)
     
     # Base route for API status
     @app.route('/')
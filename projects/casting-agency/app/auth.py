@@ -1,14 +1,23 @@
 import json
 import os
+import re
+import threading
+import time
 from flask import request
 from functools import wraps
 from jose import jwt
 from urllib.request import urlopen
+from app import metrics
 
 AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'dev-vaa4tqxczeu26tio.us.auth0.com')
 ALGORITHMS = ['RS256']
 API_AUDIENCE = os.environ.get('API_AUDIENCE', 'casting-agency-api')
 
+# JWKS caching configuration (seconds)
+JWKS_DEFAULT_TTL = int(os.environ.get('JWKS_DEFAULT_TTL', 3600))
+JWKS_MIN_REFETCH_INTERVAL = int(os.environ.get('JWKS_MIN_REFETCH_INTERVAL', 30))
+JWKS_FETCH_TIMEOUT = 5
+
 # AuthError Exception
 class AuthError(Exception):
     def __init__(self, error, status_code):
@@ -16,6 +25,136 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+class JWKSCache:
+    """
+    Process-wide store of the Auth0 signing keys, indexed by kid.
+
+    Keys are fetched lazily on first use and kept for the Cache-Control
+    max-age of the JWKS response (JWKS_DEFAULT_TTL when absent). Once three
+    quarters of that lifetime has passed, a background thread refreshes the
+    keys while requests keep using the current ones. A token signed with an
+    unknown kid forces a single refetch shared by all waiting requests, at
+    most once every JWKS_MIN_REFETCH_INTERVAL seconds. A fetch that fails
+    raises AuthError with status 401; cached keys are kept and served.
+    """
+    _max_age_pattern = re.compile(r'max-age=(\d+)')
+
+    def __init__(self, url, default_ttl=JWKS_DEFAULT_TTL,
+                 min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL):
+        self.url = url
+        self.default_ttl = default_ttl
+        self.min_refetch_interval = min_refetch_interval
+        self._keys = {}
+        self._refresh_at = 0.0
+        self._expires_at = 0.0
+        self._last_attempt = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid):
+        """
+        Returns the RSA key for kid, or None if Auth0 does not publish it
+        """
+        now = time.monotonic()
+        if now >= self._expires_at:
+            self._load()
+        elif now >= self._refresh_at:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None:
+            self._refetch_for(kid)
+            key = self._keys.get(kid)
+        return key
+
+    def clear(self):
+        """
+        Drops all cached keys so the next lookup fetches them again
+        """
+        with self._lock:
+            self._keys = {}
+            self._refresh_at = 0.0
+            self._expires_at = 0.0
+            self._last_attempt = None
+
+    def _can_attempt(self):
+        return (self._last_attempt is None or
+                time.monotonic() - self._last_attempt >= self.min_refetch_interval)
+
+    def _load(self):
+        with self._lock:
+            # Another request may have loaded the keys while we waited
+            if time.monotonic() < self._expires_at:
+                return
+            if self._keys and not self._can_attempt():
+                return
+            try:
+                self._fetch()
+            except Exception:
+                # Keep serving the previous keys if Auth0 is unreachable
+                if not self._keys:
+                    raise
+
+    def _refetch_for(self, kid):
+        with self._lock:
+            if kid in self._keys or not self._can_attempt():
+                return
+            self._fetch()
+
+    def _refresh_in_background(self):
+        if not self._can_attempt() or not self._lock.acquire(blocking=False):
+            return
+
+        def refresh():
+            try:
+                self._fetch()
+            except Exception:
+                pass
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _fetch(self):
+        # Must be called with self._lock held
+        self._last_attempt = time.monotonic()
+        try:
+            with urlopen(self.url, timeout=JWKS_FETCH_TIMEOUT) as response:
+                jwks = json.loads(response.read())
+                ttl = self._ttl(response.headers.get('Cache-Control'))
+
+            keys = {}
+            for key in jwks['keys']:
+                keys[key['kid']] = {
+                    'kty': key['kty'],
+                    'kid': key['kid'],
+                    'use': key['use'],
+                    'n': key['n'],
+                    'e': key['e']
+                }
+        except Exception as e:
+            # Timeouts, HTTP errors and malformed responses all mean the
+            # token cannot be checked, which is the client's 401 and not a 500
+            raise AuthError({
+                'code': 'jwks_unavailable',
+                'description': 'Unable to fetch the signing keys.'
+            }, 401) from e
+
+        fetched_at = time.monotonic()
+        self._keys = keys
+        self._refresh_at = fetched_at + ttl * 0.75
+        self._expires_at = fetched_at + ttl
+
+    def _ttl(self, cache_control):
+        if cache_control:
+            match = self._max_age_pattern.search(cache_control)
+            if match:
+                return max(int(match.group(1)), self.min_refetch_interval)
+        return self.default_ttl
+
+
+jwks_cache = JWKSCache(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+
+
 def get_token_auth_header():
     """
     Obtains the Access Token from the Authorization Header
@@ -73,10 +212,7 @@ def verify_decode_jwt(token):
     """
     Verifies and decodes the JWT token
     """
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     
     if 'kid' not in unverified_header:
         raise AuthError({
@@ -84,15 +220,7 @@ def verify_decode_jwt(token):
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = jwks_cache.get_key(unverified_header['kid'])
     
     if rsa_key:
         try:
@@ -137,8 +265,13 @@ def requires_auth(permission=''):
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
+            started = time.perf_counter() if metrics.enabled else None
+            try:
+                token = get_token_auth_header()
+                payload = verify_decode_jwt(token)
+            finally:
+                if started is not None:
+                    metrics.observe_auth_time(time.perf_counter() - started)
             check_permissions(permission, payload)
             return f(payload, *args, **kwargs)
         return wrapper
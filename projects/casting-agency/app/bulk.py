@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+from flask import request, abort
+
+BULK_MAX_ITEMS = 10000
+
+
+def get_bulk_items(key):
+    """
+    Reads the items of a bulk request.
+    Accepts a JSON array, a JSON object holding the array under key,
+    or NDJSON (one object per line, Content-Type application/x-ndjson).
+    """
+    if request.mimetype == 'application/x-ndjson':
+        try:
+            items = [json.loads(line) for line in request.get_data(as_text=True).splitlines()
+                     if line.strip()]
+        except ValueError:
+            abort(400)
+    else:
+        body = request.get_json(silent=True)
+        items = body.get(key) if isinstance(body, dict) else body
+
+    if not isinstance(items, list) or not items:
+        abort(400)
+    if len(items) > BULK_MAX_ITEMS:
+        abort(413)
+    return items
+
+
+def duplicate_ids(items):
+    """
+    Returns the ids given to more than one item of a bulk request
+    """
+    seen = set()
+    duplicates = set()
+    for item in items:
+        if isinstance(item, dict) and is_positive_int(item.get('id')):
+            if item['id'] in seen:
+                duplicates.add(item['id'])
+            seen.add(item['id'])
+    return duplicates
+
+
+def is_valid_string(value, max_length):
+    return isinstance(value, str) and 0 < len(value.strip()) and len(value) <= max_length
+
+
+def is_positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def parse_date(value):
+    """
+    Parses a YYYY-MM-DD string, returning None when it is invalid
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def item_error(index, status, message):
+    return {
+        'index': index,
+        'success': False,
+        'status': status,
+        'message': message
+    }
+
+
+def item_result(index, status, item_id):
+    return {
+        'index': index,
+        'success': True,
+        'status': status,
+        'id': item_id
+    }
@@ -30,6 +30,14 @@ def register_error_handlers(app):
             "message": "Method not allowed"
         }), 405
 
+    @app.errorhandler(413)
+    def payload_too_large(error):
+        return jsonify({
+            "success": False,
+            "error": 413,
+            "message": "Payload too large"
+        }), 413
+
     @app.errorhandler(422)
     def unprocessable(error):
         return jsonify({
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+from flask import Response, request, abort, stream_with_context
+from sqlalchemy import func, cast, String
+from app.models import db
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def aggregate_ids(column):
+    """
+    SQL aggregate collecting the ids of a group into a comma separated string
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return func.string_agg(cast(column, String), ',')
+    return func.group_concat(column)
+
+
+def split_ids(value):
+    """
+    Parses the output of aggregate_ids into a sorted list of ints
+    """
+    if not value:
+        return []
+    return sorted(int(i) for i in value.split(','))
+
+
+def get_export_format():
+    """
+    Reads the 'format' query parameter of an export request
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        abort(400)
+    return export_format
+
+
+def _encode_ndjson(records, fields):
+    return ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+
+
+def _encode_csv(records, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    for record in records:
+        writer.writerow({
+            key: ';'.join(map(str, value)) if isinstance(value, list) else value
+            for key, value in record.items()
+        })
+    return buffer.getvalue()
+
+
+def export_response(query, fields, format_row, export_format, filename):
+    """
+    Streams the rows of query as NDJSON or CSV.
+
+    Rows are read through a server-side cursor EXPORT_BATCH_SIZE at a time
+    and each batch is written out as one chunk, so memory use does not grow
+    with the size of the table. The first row goes out on its own so the
+    client starts receiving data without waiting for a full batch.
+    """
+    query = query.execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+    encode = _encode_csv if export_format == 'csv' else _encode_ndjson
+
+    def generate():
+        if export_format == 'csv':
+            yield ','.join(fields) + '\r\n'
+
+        batch = []
+        batch_size = 1
+        for row in query:
+            batch.append(format_row(row))
+            if len(batch) == batch_size:
+                yield encode(batch, fields)
+                batch = []
+                batch_size = EXPORT_BATCH_SIZE
+        if batch:
+            yield encode(batch, fields)
+
+    response = Response(stream_with_context(generate()),
+                        mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename={filename}.{export_format}'
+    return response
@@ -0,0 +1,213 @@
+import hmac
+import os
+import threading
+import time
+from flask import Response, abort, g, jsonify, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Set METRICS_ENABLED=False to skip registering any hook
+enabled = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+# /metrics answers only requests with 'Authorization: Bearer <METRICS_TOKEN>',
+# and is not served at all while no token is set
+token = os.environ.get('METRICS_TOKEN')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint.'),
+    'http_requests_total': ('counter', 'Requests by endpoint and status code.'),
+    'db_queries_total': ('counter', 'SQL statements executed by endpoint.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL statements by endpoint.'),
+    'auth_verify_duration_seconds': ('histogram', 'JWT verification time by endpoint.')
+}
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms aggregated per thread.
+
+    Each thread records into its own shard without taking a lock; shards
+    are only merged when the metrics are rendered. Shards of threads that
+    have exited are folded into a single retired shard at that point.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        self._retired = self._new_shard()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_shard():
+        return {'counters': {}, 'histograms': {}}
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._new_shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def inc(self, name, labels, value=1):
+        counters = self._shard()['counters']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()['histograms']
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # One slot per bucket, then +Inf, sum and count
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                histogram[i] += 1
+                break
+        else:
+            histogram[len(self.buckets)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def _merge(self, target, shard):
+        for key, value in list(shard['counters'].items()):
+            target['counters'][key] = target['counters'].get(key, 0) + value
+        for key, histogram in list(shard['histograms'].items()):
+            merged = target['histograms'].setdefault(key, [0] * len(histogram))
+            for i, value in enumerate(list(histogram)):
+                merged[i] += value
+
+    def snapshot(self):
+        """
+        Returns the merged counters and histograms of every thread
+        """
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = alive
+
+            totals = self._new_shard()
+            self._merge(totals, self._retired)
+            for _, shard in alive:
+                self._merge(totals, shard)
+        return totals
+
+    def render(self):
+        """
+        Renders the metrics in the Prometheus text exposition format
+        """
+        totals = self.snapshot()
+        series = {}
+        for (name, labels), value in totals['counters'].items():
+            series.setdefault(name, []).append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), histogram in totals['histograms'].items():
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), histogram):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {histogram[-2]}')
+            lines.append(f'{name}_count{_labels(labels)} {histogram[-1]}')
+
+        output = []
+        for name in sorted(series):
+            metric_type, description = HELP.get(name, ('untyped', ''))
+            output.append(f'# HELP {name} {description}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def observe_auth_time(seconds):
+    """
+    Records the time requires_auth spent verifying a token
+    """
+    registry.observe('auth_verify_duration_seconds', (('endpoint', _endpoint()),), seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if starts and has_request_context():
+        elapsed = time.perf_counter() - starts.pop()
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + elapsed
+
+
+def _handle_error(context):
+    # after_cursor_execute does not run for failed statements
+    connection = context.connection
+    if connection is not None and has_request_context():
+        starts = connection.info.get('query_start')
+        if starts:
+            starts.pop()
+
+
+def init_metrics(app):
+    """
+    Registers the request and SQL hooks and the /metrics endpoint
+    Does nothing when metrics are disabled
+    """
+    if not enabled:
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get('request_start')
+        if start is not None:
+            labels = (('endpoint', _endpoint()), ('method', request.method))
+            registry.observe('http_request_duration_seconds', labels,
+                             time.perf_counter() - start)
+            registry.inc('http_requests_total', labels + (('status', str(response.status_code)),))
+            registry.inc('db_queries_total', labels, g.get('db_queries', 0))
+            registry.inc('db_query_duration_seconds_total', labels, g.get('db_time', 0.0))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+            return jsonify({
+                'success': False,
+                'error': 401,
+                'message': 'A valid metrics token is required'
+            }), 401
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
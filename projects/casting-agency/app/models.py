@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import Column, String, Integer, Date, ForeignKey, Table
+from sqlalchemy import Column, String, Integer, Date, ForeignKey, Table, and_
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import relationship
 import json
@@ -42,6 +42,21 @@ movie_actors = Table(
 )
 
 
+def association_ids(parent_column, child_column, parent_ids):
+    """
+    Loads the linked ids of many parents from movie_actors in a single query
+    Returns a dict mapping each parent id to a sorted list of child ids
+    """
+    linked_ids = {parent_id: [] for parent_id in parent_ids}
+    if linked_ids:
+        rows = db.session.query(parent_column, child_column) \
+            .filter(parent_column.in_(linked_ids)) \
+            .order_by(parent_column, child_column)
+        for parent_id, child_id in rows:
+            linked_ids[parent_id].append(child_id)
+    return linked_ids
+
+
 class Movie(db.Model):
     __tablename__ = 'movies'
 
@@ -68,14 +83,54 @@ class Movie(db.Model):
         db.session.delete(self)
         db.session.commit()
 
-    def format(self):
+    def update_actor_links(self, actor_ids=None, add=(), remove=()):
+        """
+        Changes the actors linked to this movie by writing only the difference
+        to movie_actors. actor_ids replaces the whole cast, add and remove
+        change it incrementally. Ids of actors that do not exist are ignored.
+        The changes are committed by the next call to update().
+        """
+        current = {actor_id for actor_id, in db.session.query(movie_actors.c.actor_id)
+                   .filter(movie_actors.c.movie_id == self.id)}
+        target = set(current) if actor_ids is None else set(actor_ids)
+        target = (target | set(add)) - set(remove)
+
+        to_remove = current - target
+        to_add = target - current
+        if to_add:
+            to_add = {actor_id for actor_id, in db.session.query(Actor.id)
+                      .filter(Actor.id.in_(to_add))}
+
+        if to_remove:
+            db.session.execute(movie_actors.delete().where(and_(
+                movie_actors.c.movie_id == self.id,
+                movie_actors.c.actor_id.in_(to_remove)
+            )))
+        if to_add:
+            db.session.execute(movie_actors.insert(), [
+                {'movie_id': self.id, 'actor_id': actor_id} for actor_id in to_add
+            ])
+
+    def format(self, actor_ids=None):
+        if actor_ids is None:
+            actor_ids = association_ids(movie_actors.c.movie_id,
+                                        movie_actors.c.actor_id, [self.id])[self.id]
         return {
             'id': self.id,
             'title': self.title,
             'release_date': self.release_date.isoformat(),
-            'actors': [actor.id for actor in self.actors]
+            'actors': actor_ids
         }
 
+    @classmethod
+    def format_all(cls, movies):
+        """
+        Formats a list of movies, loading all their actor ids in one query
+        """
+        actor_ids = association_ids(movie_actors.c.movie_id, movie_actors.c.actor_id,
+                                    [movie.id for movie in movies])
+        return [movie.format(actor_ids[movie.id]) for movie in movies]
+
     def __repr__(self):
         return f'<Movie {self.id} {self.title}>'
 
@@ -104,14 +159,26 @@ class Actor(db.Model):
         db.session.delete(self)
         db.session.commit()
 
-    def format(self):
+    def format(self, movie_ids=None):
+        if movie_ids is None:
+            movie_ids = association_ids(movie_actors.c.actor_id,
+                                        movie_actors.c.movie_id, [self.id])[self.id]
         return {
             'id': self.id,
             'name': self.name,
             'age': self.age,
             'gender': self.gender,
-            'movies': [movie.id for movie in self.movies]
+            'movies': movie_ids
         }
 
+    @classmethod
+    def format_all(cls, actors):
+        """
+        Formats a list of actors, loading all their movie ids in one query
+        """
+        movie_ids = association_ids(movie_actors.c.actor_id, movie_actors.c.movie_id,
+                                    [actor.id for actor in actors])
+        return [actor.format(movie_ids[actor.id]) for actor in actors]
+
     def __repr__(self):
         return f'<Actor {self.id} {self.name}>'
\ No newline at end of file
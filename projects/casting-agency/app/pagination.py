@@ -0,0 +1,60 @@
+import base64
+import binascii
+import json
+from flask import request, abort
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(last_id):
+    """
+    Encodes the id of the last row on a page as an opaque cursor
+    """
+    raw = json.dumps({'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor back to a row id
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))['id']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        abort(400)
+
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        abort(400)
+    return last_id
+
+
+def get_page_args():
+    """
+    Reads the 'limit' and 'cursor' query parameters of a list request
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit < 1:
+        abort(400)
+
+    cursor = request.args.get('cursor')
+    after_id = decode_cursor(cursor) if cursor else None
+    return min(limit, MAX_PAGE_SIZE), after_id
+
+
+def paginate(query, model, limit, after_id=None):
+    """
+    Returns one page of rows ordered by id and the cursor of the next page.
+    Filtering on id instead of using OFFSET keeps every page as cheap as
+    the first one and stable while new rows are inserted.
+    """
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+
+    rows = query.order_by(model.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request, abort
-from app.models import Actor
+from app.models import db, Actor, movie_actors
 from app.auth import requires_auth
+from app.pagination import get_page_args, paginate
+from app.export import aggregate_ids, split_ids, get_export_format, export_response
+from app.bulk import get_bulk_items, duplicate_ids, is_valid_string, is_positive_int, \
+    item_error, item_result
 
 actors_blueprint = Blueprint('actors', __name__)
 
@@ -8,21 +12,54 @@ actors_blueprint = Blueprint('actors', __name__)
 @requires_auth('get:actors')
 def get_actors(payload):
     """
-    Get all actors
+    Get a page of actors ordered by id
+    Query parameters: 'limit' (page size), 'cursor' (next_cursor of the previous page)
     Permission: 'get:actors'
     """
+    limit, after_id = get_page_args()
+
     try:
-        actors = Actor.query.all()
-        formatted_actors = [actor.format() for actor in actors]
+        actors, next_cursor = paginate(Actor.query, Actor, limit, after_id)
+        formatted_actors = Actor.format_all(actors)
         
         return jsonify({
             'success': True,
-            'actors': formatted_actors
+            'actors': formatted_actors,
+            'next_cursor': next_cursor
         }), 200
     except Exception as e:
         abort(500)
 
 
+@actors_blueprint.route('/actors/export', methods=['GET'])
+@requires_auth('get:actors')
+def export_actors(payload):
+    """
+    Stream every actor as NDJSON, or as CSV with 'format=csv'
+    Permission: 'get:actors'
+    """
+    export_format = get_export_format()
+
+    query = db.session.query(
+        Actor.id, Actor.name, Actor.age, Actor.gender,
+        aggregate_ids(movie_actors.c.movie_id).label('movies')
+    ).outerjoin(movie_actors, movie_actors.c.actor_id == Actor.id) \
+        .group_by(Actor.id) \
+        .order_by(Actor.id)
+
+    def format_row(row):
+        return {
+            'id': row.id,
+            'name': row.name,
+            'age': row.age,
+            'gender': row.gender,
+            'movies': split_ids(row.movies)
+        }
+
+    return export_response(query, ['id', 'name', 'age', 'gender', 'movies'],
+                           format_row, export_format, 'actors')
+
+
 @actors_blueprint.route('/actors/<int:actor_id>', methods=['GET'])
 @requires_auth('get:actors')
 def get_actor(payload, actor_id):
@@ -73,6 +110,82 @@ def create_actor(payload):
         abort(422)
 
 
+@actors_blueprint.route('/actors/bulk', methods=['POST'])
+@requires_auth('post:actors')
+def bulk_create_actors(payload):
+    """
+    Create or replace many actors in a single transaction
+    Items without an 'id' are inserted, items with an 'id' replace that actor
+    Permission: 'post:actors'
+    """
+    items = get_bulk_items('actors')
+    duplicates = duplicate_ids(items)
+
+    results = [None] * len(items)
+    inserts = []
+    updates = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = item_error(index, 400, 'Item must be an object')
+            continue
+
+        if 'id' in item and not is_positive_int(item['id']):
+            results[index] = item_error(index, 400, 'Invalid id')
+            continue
+
+        if 'id' in item and item['id'] in duplicates:
+            results[index] = item_error(index, 422, 'Duplicate id %d in this request' % item['id'])
+            continue
+
+        if not is_valid_string(item.get('name'), 120) or \
+                not is_positive_int(item.get('age')) or \
+                not is_valid_string(item.get('gender'), 10):
+            results[index] = item_error(index, 400, 'Valid name, age and gender are required')
+            continue
+
+        mapping = {
+            'name': item['name'],
+            'age': item['age'],
+            'gender': item['gender']
+        }
+        if 'id' in item:
+            mapping['id'] = item['id']
+            updates.append((index, mapping))
+        else:
+            inserts.append((index, mapping))
+
+    if updates:
+        existing_ids = {row.id for row in db.session.query(Actor.id)
+                        .filter(Actor.id.in_({mapping['id'] for _, mapping in updates}))}
+        for index, mapping in updates:
+            if mapping['id'] not in existing_ids:
+                results[index] = item_error(index, 404, 'Actor not found')
+        updates = [(index, mapping) for index, mapping in updates
+                   if mapping['id'] in existing_ids]
+
+    try:
+        db.session.bulk_insert_mappings(Actor, [mapping for _, mapping in inserts],
+                                        return_defaults=True)
+        db.session.bulk_update_mappings(Actor, [mapping for _, mapping in updates])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        abort(422)
+
+    for index, mapping in inserts:
+        results[index] = item_result(index, 201, mapping['id'])
+    for index, mapping in updates:
+        results[index] = item_result(index, 200, mapping['id'])
+
+    return jsonify({
+        'success': True,
+        'created': len(inserts),
+        'updated': len(updates),
+        'failed': len(items) - len(inserts) - len(updates),
+        'results': results
+    }), 200
+
+
 @actors_blueprint.route('/actors/<int:actor_id>', methods=['PATCH'])
 @requires_auth('patch:actors')
 def update_actor(payload, actor_id):
@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request, abort
-from app.models import Movie
+from app.models import db, Movie, Actor, movie_actors
 from app.auth import requires_auth
+from app.pagination import get_page_args, paginate
+from app.export import aggregate_ids, split_ids, get_export_format, export_response
+from app.bulk import get_bulk_items, duplicate_ids, is_valid_string, is_positive_int, parse_date, \
+    item_error, item_result
 from datetime import datetime
 
 movies_blueprint = Blueprint('movies', __name__)
@@ -9,21 +13,53 @@ movies_blueprint = Blueprint('movies', __name__)
 @requires_auth('get:movies')
 def get_movies(payload):
     """
-    Get all movies
+    Get a page of movies ordered by id
+    Query parameters: 'limit' (page size), 'cursor' (next_cursor of the previous page)
     Permission: 'get:movies'
     """
+    limit, after_id = get_page_args()
+
     try:
-        movies = Movie.query.all()
-        formatted_movies = [movie.format() for movie in movies]
+        movies, next_cursor = paginate(Movie.query, Movie, limit, after_id)
+        formatted_movies = Movie.format_all(movies)
         
         return jsonify({
             'success': True,
-            'movies': formatted_movies
+            'movies': formatted_movies,
+            'next_cursor': next_cursor
         }), 200
     except Exception as e:
         abort(500)
 
 
+@movies_blueprint.route('/movies/export', methods=['GET'])
+@requires_auth('get:movies')
+def export_movies(payload):
+    """
+    Stream every movie as NDJSON, or as CSV with 'format=csv'
+    Permission: 'get:movies'
+    """
+    export_format = get_export_format()
+
+    query = db.session.query(
+        Movie.id, Movie.title, Movie.release_date,
+        aggregate_ids(movie_actors.c.actor_id).label('actors')
+    ).outerjoin(movie_actors, movie_actors.c.movie_id == Movie.id) \
+        .group_by(Movie.id) \
+        .order_by(Movie.id)
+
+    def format_row(row):
+        return {
+            'id': row.id,
+            'title': row.title,
+            'release_date': row.release_date.isoformat(),
+            'actors': split_ids(row.actors)
+        }
+
+    return export_response(query, ['id', 'title', 'release_date', 'actors'],
+                           format_row, export_format, 'movies')
+
+
 @movies_blueprint.route('/movies/<int:movie_id>', methods=['GET'])
 @requires_auth('get:movies')
 def get_movie(payload, movie_id):
@@ -86,11 +122,120 @@ def create_movie(payload):
         abort(422)
 
 
+@movies_blueprint.route('/movies/bulk', methods=['POST'])
+@requires_auth('post:movies')
+def bulk_create_movies(payload):
+    """
+    Create or replace many movies and their actor links in a single transaction
+    Items without an 'id' are inserted, items with an 'id' replace that movie
+    (its actor links are only replaced when 'actors' is given)
+    Permission: 'post:movies'
+    """
+    items = get_bulk_items('movies')
+    duplicates = duplicate_ids(items)
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = item_error(index, 400, 'Item must be an object')
+            continue
+
+        if 'id' in item and not is_positive_int(item['id']):
+            results[index] = item_error(index, 400, 'Invalid id')
+            continue
+
+        if 'id' in item and item['id'] in duplicates:
+            results[index] = item_error(index, 422, 'Duplicate id %d in this request' % item['id'])
+            continue
+
+        release_date = parse_date(item.get('release_date'))
+        if not is_valid_string(item.get('title'), 120) or release_date is None:
+            results[index] = item_error(index, 400, 'Valid title and release_date are required')
+            continue
+
+        actor_ids = item.get('actors')
+        if actor_ids is not None and (not isinstance(actor_ids, list) or
+                                      not all(is_positive_int(i) for i in actor_ids)):
+            results[index] = item_error(index, 400, 'actors must be a list of actor ids')
+            continue
+
+        mapping = {
+            'title': item['title'],
+            'release_date': release_date
+        }
+        if 'id' in item:
+            mapping['id'] = item['id']
+        valid.append((index, mapping, None if actor_ids is None else set(actor_ids)))
+
+    # Check every referenced actor and movie with one query each
+    requested_actor_ids = set()
+    requested_movie_ids = set()
+    for _, mapping, actor_ids in valid:
+        requested_actor_ids.update(actor_ids or ())
+        if 'id' in mapping:
+            requested_movie_ids.add(mapping['id'])
+
+    existing_actor_ids = {row.id for row in db.session.query(Actor.id)
+                          .filter(Actor.id.in_(requested_actor_ids))} if requested_actor_ids else set()
+    existing_movie_ids = {row.id for row in db.session.query(Movie.id)
+                          .filter(Movie.id.in_(requested_movie_ids))} if requested_movie_ids else set()
+
+    inserts = []
+    updates = []
+    for index, mapping, actor_ids in valid:
+        if 'id' in mapping and mapping['id'] not in existing_movie_ids:
+            results[index] = item_error(index, 404, 'Movie not found')
+        elif actor_ids and not actor_ids <= existing_actor_ids:
+            results[index] = item_error(index, 422, 'Unknown actor ids: ' + ', '.join(
+                str(i) for i in sorted(actor_ids - existing_actor_ids)))
+        elif 'id' in mapping:
+            updates.append((index, mapping, actor_ids))
+        else:
+            inserts.append((index, mapping, actor_ids))
+
+    try:
+        db.session.bulk_insert_mappings(Movie, [mapping for _, mapping, _ in inserts],
+                                        return_defaults=True)
+        db.session.bulk_update_mappings(Movie, [mapping for _, mapping, _ in updates])
+
+        relinked_ids = [mapping['id'] for _, mapping, actor_ids in updates
+                        if actor_ids is not None]
+        if relinked_ids:
+            db.session.execute(movie_actors.delete()
+                               .where(movie_actors.c.movie_id.in_(relinked_ids)))
+
+        links = [{'movie_id': mapping['id'], 'actor_id': actor_id}
+                 for _, mapping, actor_ids in inserts + updates
+                 for actor_id in actor_ids or ()]
+        if links:
+            db.session.execute(movie_actors.insert(), links)
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        abort(422)
+
+    for index, mapping, _ in inserts:
+        results[index] = item_result(index, 201, mapping['id'])
+    for index, mapping, _ in updates:
+        results[index] = item_result(index, 200, mapping['id'])
+
+    return jsonify({
+        'success': True,
+        'created': len(inserts),
+        'updated': len(updates),
+        'failed': len(items) - len(inserts) - len(updates),
+        'results': results
+    }), 200
+
+
 @movies_blueprint.route('/movies/<int:movie_id>', methods=['PATCH'])
 @requires_auth('patch:movies')
 def update_movie(payload, movie_id):
     """
     Update an existing movie
+    'actors' replaces the cast, 'actors_add' and 'actors_remove' change it incrementally
     Permission: 'patch:movies'
     """
     movie = Movie.query.get(movie_id)
@@ -113,13 +258,20 @@ def update_movie(payload, movie_id):
         except ValueError:
             abort(400)
     
-    # Update actors if provided
-    if 'actors' in body and isinstance(body['actors'], list):
-        from app.models import Actor
-        actors = Actor.query.filter(Actor.id.in_(body['actors'])).all()
-        movie.actors = actors
+    # Update actors if provided, either as a full list or as incremental changes
+    actor_changes = {}
+    for key in ('actors', 'actors_add', 'actors_remove'):
+        if key in body:
+            if not isinstance(body[key], list) or \
+                    not all(is_positive_int(actor_id) for actor_id in body[key]):
+                abort(400)
+            actor_changes[key] = body[key]
     
     try:
+        if actor_changes:
+            movie.update_actor_links(actor_ids=actor_changes.get('actors'),
+                                     add=actor_changes.get('actors_add', ()),
+                                     remove=actor_changes.get('actors_remove', ()))
         movie.update()
         
         return jsonify({
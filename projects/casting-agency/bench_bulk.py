@@ -0,0 +1,53 @@
+"""
+Bulk create benchmark.
+
+Times creating actors one POST /actors request at a time against a single
+POST /actors/bulk request with all of them. The view functions are called
+without their requires_auth wrapper, so no token is needed and only the
+request handling and database work are measured.
+
+    DATABASE_URL=postgresql://... python bench_bulk.py [actors]
+"""
+import json
+import sys
+import time
+
+from app import create_app
+from app.models import db, Actor
+from app.routes import actors
+
+
+def items(count, offset):
+    return [{'name': 'Bench Actor %d' % (offset + i), 'age': 30 + i % 40,
+             'gender': 'Female' if i % 2 else 'Male'} for i in range(count)]
+
+
+def one_by_one(app, batch):
+    for item in batch:
+        with app.test_request_context('/actors', method='POST', json=item):
+            actors.create_actor.__wrapped__({})
+
+
+def bulk(app, batch):
+    with app.test_request_context('/actors/bulk', method='POST', json=batch):
+        response, status = actors.bulk_create_actors.__wrapped__({})
+        assert json.loads(response.get_data())['created'] == len(batch)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        before = Actor.query.count()
+
+        for name, create, offset in (('POST /actors per item', one_by_one, 0),
+                                     ('POST /actors/bulk', bulk, count)):
+            start = time.perf_counter()
+            create(app, items(count, offset))
+            elapsed = time.perf_counter() - start
+            print('%-22s %8.2f s  %10.0f actors/s' % (name, elapsed, count / elapsed))
+
+        Actor.query.filter(Actor.name.like('Bench Actor %')).delete(synchronize_session=False)
+        db.session.commit()
+        assert Actor.query.count() == before
@@ -1,6 +1,6 @@
 import json
 import unittest
-from app.models import Actor
+from app.models import Actor, Movie
 from tests.test_base import CastingAgencyTestCase
 
 
@@ -18,6 +18,91 @@ class ActorEndpointTestCase(CastingAgencyTestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(len(data['actors']) > 0)
 
+    def test_get_actors_pagination(self):
+        """Test actors are paged by cursor without repeating rows"""
+        res = self.client().get('/actors?limit=1', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        first_page = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(first_page['actors']), 1)
+        self.assertTrue(first_page['next_cursor'])
+
+        res = self.client().get(f'/actors?limit=1&cursor={first_page["next_cursor"]}', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        second_page = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(second_page['actors'][0]['id'], first_page['actors'][0]['id'])
+
+    def test_get_actors_error_400_invalid_cursor(self):
+        """Test error when paging actors with a malformed cursor"""
+        res = self.client().get('/actors?cursor=not-a-cursor', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
+    def test_get_actors_constant_query_count(self):
+        """Test listing actors does not issue a query per actor"""
+        def get_actors():
+            res = self.client().get('/actors', headers={
+                'Authorization': f'Bearer {self.assistant_token}'
+            })
+            self.assertEqual(res.status_code, 200)
+
+        baseline = self.count_queries(get_actors)
+
+        with self.app.app_context():
+            movie = Movie.query.first()
+            for i in range(10):
+                actor = Actor(name=f'Extra Actor {i}', age=30 + i, gender='Female')
+                actor.insert()
+                movie.actors.append(actor)
+            movie.update()
+
+        self.assertEqual(self.count_queries(get_actors), baseline)
+
+    def test_export_actors_ndjson(self):
+        """Test actors are streamed as one JSON document per line"""
+        res = self.client().get('/actors/export', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        actors = [json.loads(line) for line in res.data.decode().splitlines()]
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        self.assertTrue(len(actors) > 0)
+        self.assertTrue(any(actor['movies'] for actor in actors))
+
+    def test_export_actors_sends_first_row_right_away(self):
+        """Test the first exported actor is sent before a full batch is read"""
+        res = self.client().get('/actors/export', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        }, buffered=False)
+        chunks = iter(res.response)
+        first = next(chunks).decode().splitlines()
+        rest = b''.join(chunks).decode().splitlines()
+        res.close()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(first), 1)
+        self.assertTrue(rest)
+
+    def test_export_actors_error_400(self):
+        """Test error when exporting actors in an unsupported format"""
+        res = self.client().get('/actors/export?format=xml', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
     def test_get_actors_error_401(self):
         """Test error when retrieving actors without authentication"""
         res = self.client().get('/actors')
@@ -43,6 +128,49 @@ class ActorEndpointTestCase(CastingAgencyTestCase):
             created_actor = Actor.query.get(data['created'])
             self.assertIsNotNone(created_actor)
 
+    def test_bulk_create_actors_success(self):
+        """Test many actors are created in one request with per-item results"""
+        res = self.client().post('/actors/bulk',
+            headers={'Authorization': f'Bearer {self.director_token}'},
+            json=[self.new_actor, {'name': 'Second Bulk Actor', 'age': 50, 'gender': 'Female'},
+                  {'name': 'Invalid Actor'}]
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(data['failed'], 1)
+        self.assertEqual(data['results'][2]['status'], 400)
+
+        with self.app.app_context():
+            self.assertIsNotNone(Actor.query.get(data['results'][0]['id']))
+            self.assertIsNotNone(Actor.query.get(data['results'][1]['id']))
+
+    def test_bulk_replace_actors_duplicate_ids(self):
+        """Test items sharing an id are rejected with 422 naming the id"""
+        duplicate = dict(self.new_actor, id=999999)
+        res = self.client().post('/actors/bulk',
+            headers={'Authorization': f'Bearer {self.director_token}'},
+            json=[duplicate, duplicate]
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['failed'], 2)
+        self.assertEqual([r['status'] for r in data['results']], [422, 422])
+        self.assertIn('999999', data['results'][0]['message'])
+
+    def test_bulk_create_actors_error_403(self):
+        """Test error when bulk creating actors with insufficient permissions"""
+        res = self.client().post('/actors/bulk',
+            headers={'Authorization': f'Bearer {self.assistant_token}'},
+            json=[self.new_actor]
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(data['success'], False)
+
     def test_create_actor_error_400(self):
         """Test error when creating actor with missing data"""
         res = self.client().post('/actors',
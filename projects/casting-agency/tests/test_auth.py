@@ -1,6 +1,9 @@
 import json
 import unittest
+from unittest import mock
+from urllib.error import HTTPError, URLError
 from tests.test_base import CastingAgencyTestCase
+from app.auth import AuthError, JWKSCache
 from app.models import Movie, Actor
 
 
@@ -140,4 +143,96 @@ class RBACTestCase(CastingAgencyTestCase):
             
             self.assertEqual(res.status_code, 200)
             self.assertEqual(data['success'], True)
-            self.assertEqual(data['deleted'], movie.id)
\ No newline at end of file
+            self.assertEqual(data['deleted'], movie.id)
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+    """Test case for the Auth0 signing key cache"""
+
+    def setUp(self):
+        self.cache = JWKSCache('https://example.auth0.com/.well-known/jwks.json',
+                               default_ttl=3600, min_refetch_interval=0)
+
+    def jwks_response(self, *kids, cache_control=None):
+        """Build a fake urlopen response publishing the given key ids"""
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.read.return_value = json.dumps({'keys': [
+            {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'n': 'n', 'e': 'AQAB'}
+            for kid in kids
+        ]}).encode()
+        response.headers = {'Cache-Control': cache_control} if cache_control else {}
+        return response
+
+    def test_keys_fetched_once(self):
+        """Test repeated lookups are served from the cache"""
+        with mock.patch('app.auth.urlopen',
+                        return_value=self.jwks_response('a', 'b')) as urlopen:
+            self.assertEqual(self.cache.get_key('a')['kid'], 'a')
+            self.assertEqual(self.cache.get_key('b')['kid'], 'b')
+            self.assertEqual(self.cache.get_key('a')['kid'], 'a')
+
+        self.assertEqual(urlopen.call_count, 1)
+
+    def test_unknown_kid_forces_refetch(self):
+        """Test a rotated signing key triggers a refetch"""
+        with mock.patch('app.auth.urlopen', side_effect=[
+            self.jwks_response('a'),
+            self.jwks_response('a', 'b')
+        ]) as urlopen:
+            self.cache.get_key('a')
+            self.assertEqual(self.cache.get_key('b')['kid'], 'b')
+
+        self.assertEqual(urlopen.call_count, 2)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        """Test unknown kids cannot force a fetch on every request"""
+        self.cache.min_refetch_interval = 60
+        with mock.patch('app.auth.urlopen',
+                        return_value=self.jwks_response('a')) as urlopen:
+            self.assertIsNone(self.cache.get_key('missing'))
+            self.assertIsNone(self.cache.get_key('missing'))
+
+        self.assertEqual(urlopen.call_count, 1)
+
+    def test_cache_control_max_age_is_honoured(self):
+        """Test the cache expires keys after the response max-age"""
+        clock = [0]
+        response = self.jwks_response('a', cache_control='public, max-age=15')
+        with mock.patch('app.auth.urlopen', return_value=response) as urlopen, \
+                mock.patch('app.auth.time.monotonic', side_effect=lambda: clock[0]):
+            self.cache.get_key('a')
+            clock[0] = 10
+            self.cache.get_key('a')
+            clock[0] = 20
+            self.cache.get_key('a')
+
+        self.assertEqual(urlopen.call_count, 2)
+
+    def test_stale_keys_served_when_auth0_unreachable(self):
+        """Test previously fetched keys survive a failed refresh"""
+        with mock.patch('app.auth.urlopen', side_effect=[
+            self.jwks_response('a', cache_control='max-age=0'),
+            OSError('unreachable')
+        ]):
+            self.cache.get_key('a')
+            self.assertEqual(self.cache.get_key('a')['kid'], 'a')
+
+
+    def test_failed_refetch_for_unknown_kid_is_401(self):
+        """Test a refetch that fails rejects the token instead of erroring"""
+        broken = self.jwks_response('a')
+        broken.read.return_value = b'<html>Bad Gateway</html>'
+        failures = [
+            URLError('timed out'),
+            HTTPError(self.cache.url, 503, 'Service Unavailable', {}, None),
+            broken
+        ]
+        with mock.patch('app.auth.urlopen',
+                        side_effect=[self.jwks_response('a')] + failures):
+            self.cache.get_key('a')
+            for _ in failures:
+                with self.assertRaises(AuthError) as raised:
+                    self.cache.get_key('b')
+                self.assertEqual(raised.exception.status_code, 401)
+                self.assertEqual(self.cache.get_key('a')['kid'], 'a')
@@ -2,6 +2,7 @@ import os
 import unittest
 import json
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import date
 
 from app import create_app
@@ -48,6 +49,22 @@ class CastingAgencyTestCase(unittest.TestCase):
         """Executed after each test"""
         pass
 
+    def count_queries(self, func):
+        """Run func and return the number of SQL statements it executed"""
+        count = [0]
+
+        def before_cursor_execute(*args):
+            count[0] += 1
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            func()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        return count[0]
+
     def create_sample_data(self):
         """Create some sample data for testing"""
         try:
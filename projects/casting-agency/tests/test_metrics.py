@@ -0,0 +1,72 @@
+import unittest
+from sqlalchemy import text
+from app import metrics
+from app.metrics import MetricsRegistry
+from app.models import db
+from tests.test_base import CastingAgencyTestCase
+
+
+class MetricsEndpointTestCase(CastingAgencyTestCase):
+    """Test case for the /metrics endpoint"""
+
+    def setUp(self):
+        self.previous_token = metrics.token
+        metrics.token = 'test-metrics-token'
+        super().setUp()
+
+    def tearDown(self):
+        metrics.token = self.previous_token
+        super().tearDown()
+
+    def test_get_metrics_success(self):
+        """Test request latency and query counts are exposed per endpoint"""
+        self.client().get('/actors', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        res = self.client().get('/metrics', headers={
+            'Authorization': 'Bearer test-metrics-token'
+        })
+        body = res.data.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{endpoint="actors.get_actors",method="GET"}', body)
+        self.assertIn('db_queries_total{endpoint="actors.get_actors",method="GET"}', body)
+        self.assertIn('auth_verify_duration_seconds_count{endpoint="actors.get_actors"}', body)
+
+    def test_get_metrics_error_401(self):
+        """Test metrics are not served without the metrics token"""
+        res = self.client().get('/metrics', headers={'Authorization': 'Bearer wrong'})
+
+        self.assertEqual(res.status_code, 401)
+        self.assertNotIn(b'http_requests_total', res.data)
+
+    def test_get_metrics_error_404_without_token(self):
+        """Test /metrics is not served while no metrics token is configured"""
+        metrics.token = None
+        res = self.client().get('/metrics')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_failed_statement_releases_query_start(self):
+        """Test a failing SQL statement does not leave its start time behind"""
+        with self.app.test_request_context('/actors'):
+            with db.engine.connect() as connection:
+                with self.assertRaises(Exception):
+                    connection.execute(text('SELECT * FROM no_such_table'))
+                self.assertEqual(connection.info.get('query_start', []), [])
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+    """Test case for the per-thread metrics registry"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test rendered histogram buckets count every smaller observation"""
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            registry.observe('latency', (('endpoint', 'test'),), value)
+        body = registry.render()
+
+        self.assertIn('latency_bucket{endpoint="test",le="0.1"} 1', body)
+        self.assertIn('latency_bucket{endpoint="test",le="1.0"} 2', body)
+        self.assertIn('latency_bucket{endpoint="test",le="+Inf"} 3', body)
+        self.assertIn('latency_count{endpoint="test"} 3', body)
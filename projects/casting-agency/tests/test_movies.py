@@ -1,6 +1,7 @@
 import json
 import unittest
-from app.models import Movie
+from datetime import date
+from app.models import Movie, Actor
 from tests.test_base import CastingAgencyTestCase
 
 
@@ -18,6 +19,56 @@ class MovieEndpointTestCase(CastingAgencyTestCase):
         self.assertEqual(data['success'], True)
         self.assertTrue(len(data['movies']) > 0)
 
+    def test_get_movies_pagination(self):
+        """Test movies are paged by cursor without repeating rows"""
+        res = self.client().get('/movies?limit=1', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        first_page = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(first_page['movies']), 1)
+        self.assertTrue(first_page['next_cursor'])
+
+        res = self.client().get(f'/movies?limit=1&cursor={first_page["next_cursor"]}', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        second_page = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(second_page['movies'][0]['id'], first_page['movies'][0]['id'])
+
+    def test_get_movies_constant_query_count(self):
+        """Test listing movies does not issue a query per movie"""
+        def get_movies():
+            res = self.client().get('/movies', headers={
+                'Authorization': f'Bearer {self.assistant_token}'
+            })
+            self.assertEqual(res.status_code, 200)
+
+        baseline = self.count_queries(get_movies)
+
+        with self.app.app_context():
+            actor = Actor.query.first()
+            for i in range(10):
+                movie = Movie(title=f'Extra Movie {i}', release_date=date(2023, 1, 1))
+                movie.actors.append(actor)
+                movie.insert()
+
+        self.assertEqual(self.count_queries(get_movies), baseline)
+
+    def test_export_movies_csv(self):
+        """Test movies are streamed as CSV with a header row"""
+        res = self.client().get('/movies/export?format=csv', headers={
+            'Authorization': f'Bearer {self.assistant_token}'
+        })
+        lines = res.data.decode().splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'text/csv')
+        self.assertEqual(lines[0], 'id,title,release_date,actors')
+        self.assertTrue(len(lines) > 1)
+
     def test_get_movies_error_401(self):
         """Test error when retrieving movies without authentication"""
         res = self.client().get('/movies')
@@ -43,6 +94,40 @@ class MovieEndpointTestCase(CastingAgencyTestCase):
             created_movie = Movie.query.get(data['created'])
             self.assertIsNotNone(created_movie)
 
+    def test_bulk_create_movies_success(self):
+        """Test many movies and their actor links are created in one request"""
+        with self.app.app_context():
+            actor_id = Actor.query.first().id
+
+        res = self.client().post('/movies/bulk',
+            headers={'Authorization': f'Bearer {self.producer_token}'},
+            json={'movies': [
+                {'title': 'Bulk Movie 1', 'release_date': '2024-05-01', 'actors': [actor_id]},
+                {'title': 'Bulk Movie 2', 'release_date': '2024-05-02'},
+                {'title': 'Bulk Movie 3', 'release_date': 'not-a-date'}
+            ]}
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(data['failed'], 1)
+
+        with self.app.app_context():
+            movie = Movie.query.get(data['results'][0]['id'])
+            self.assertEqual(movie.format()['actors'], [actor_id])
+
+    def test_bulk_create_movies_error_400(self):
+        """Test error when bulk creating movies without any items"""
+        res = self.client().post('/movies/bulk',
+            headers={'Authorization': f'Bearer {self.producer_token}'},
+            json=[]
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
     def test_create_movie_error_400(self):
         """Test error when creating movie with missing data"""
         res = self.client().post('/movies',
@@ -89,6 +174,39 @@ class MovieEndpointTestCase(CastingAgencyTestCase):
             updated_movie = Movie.query.get(movie.id)
             self.assertEqual(updated_movie.title, 'Updated Movie Title')
 
+    def test_update_movie_actor_changes(self):
+        """Test actors can be added to and removed from a movie incrementally"""
+        with self.app.app_context():
+            movie = Movie.query.first()
+            movie_id = movie.id
+            actor_ids = movie.format()['actors']
+            new_actor = Actor(name='Added Actor', age=33, gender='Female')
+            new_actor.insert()
+            new_actor_id = new_actor.id
+
+        res = self.client().patch(f'/movies/{movie_id}',
+            headers={'Authorization': f'Bearer {self.director_token}'},
+            json={'actors_add': [new_actor_id], 'actors_remove': actor_ids[:1]}
+        )
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['movie']['actors'], sorted(actor_ids[1:] + [new_actor_id]))
+
+    def test_update_movie_error_400_invalid_actors(self):
+        """Test error when updating movie actors with a malformed list"""
+        with self.app.app_context():
+            movie = Movie.query.first()
+
+            res = self.client().patch(f'/movies/{movie.id}',
+                headers={'Authorization': f'Bearer {self.director_token}'},
+                json={'actors_add': 'not-a-list'}
+            )
+            data = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 400)
+            self.assertEqual(data['success'], False)
+
     def test_update_movie_error_404(self):
         """Test error when updating non-existent movie"""
         res = self.client().patch('/movies/9999',